@@ -3,6 +3,8 @@ import os
 from neo4j import GraphDatabase
 from openai import OpenAI
 from dotenv import load_dotenv
+# Índice full-text sobre Subtipo.texto_busqueda, creado por run_II_simap.py
+from texto_busqueda import INDICE_SUBTIPOS, consulta_lucene
 
 load_dotenv()
 
@@ -16,39 +18,33 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 
 driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
+# Búsqueda parametrizada: el modelo solo aporta términos, nunca Cypher
+CYPHER_BUSQUEDA = """
+CALL db.index.fulltext.queryNodes($indice, $consulta)
+YIELD node, score
+RETURN node AS s, score
+ORDER BY score DESC
+LIMIT $limite
+"""
+
 
 # ============================================================
-# 1. Genera Cypher conceptual a partir de la pregunta del usuario
+# 1. Genera la consulta conceptual a partir de la pregunta del usuario
 # ============================================================
-def generar_cypher_semantico(pregunta):
+def extraer_terminos(pregunta):
     prompt = f"""
-Sos un analizador semántico de grafos.
-Debés generar EXCLUSIVAMENTE una consulta Cypher que busque nodos Subtipo
-a partir de las ideas presentes en la pregunta del usuario.
-
-La búsqueda debe ser:
-- basada en conceptos
-- sin igualdad exacta
-- usando coincidencias en los textos de nombre, copete y consiste
+Sos un analizador semántico de normativa PAMI.
+Extraé de la pregunta del usuario las palabras o conceptos clave para buscar
+subtipos de trámite (nombre, copete y consiste).
 
-Esquema disponible:
-(Subtipo {{nombre, copete, consiste}})
+- Incluí sinónimos o variantes útiles (singular/plural, términos técnicos).
+- Frases cortas solo si el concepto lo requiere ("grupo familiar").
+- Sin artículos, preposiciones ni palabras genéricas como "trámite".
 
 Pregunta del usuario:
 \"\"\"{pregunta}\"\"\"
 
-
-La consulta debe tener esta estructura:
-
-MATCH (s:Subtipo)
-WHERE s.nombre =~ '(?i).*<palabra o concepto>.*'
-   OR s.copete =~ '(?i).*<palabra o concepto>.*'
-   OR s.consiste =~ '(?i).*<palabra o concepto>.*'
-RETURN s LIMIT 20
-
-No inventes propiedades.
-
-Devolvé solo la consulta Cypher, sin comillas ni markdown.
+Devolvé solo un array JSON de strings, sin markdown.
 """
 
     respuesta = client.chat.completions.create(
@@ -57,17 +53,47 @@ Devolvé solo la consulta Cypher, sin comillas ni markdown.
         temperature=0
     )
 
-    return respuesta.choices[0].message.content.strip()
+    contenido = respuesta.choices[0].message.content.strip().strip("`")
+    contenido = contenido.removeprefix("json").strip()
+    try:
+        terminos = json.loads(contenido)
+    except json.JSONDecodeError:
+        terminos = contenido
+    # Si no vino un array (p. ej. el string "a, b" o un objeto), no iterar
+    # caracter por caracter: se parte por comas
+    if not isinstance(terminos, list):
+        terminos = str(terminos).split(",")
+    return [str(t).strip() for t in terminos if str(t).strip()]
+
+def generar_cypher_semantico(pregunta, limite=20):
+    """
+    Devuelve (cypher, parámetros) para buscar los Subtipo relevantes en el
+    índice de términos plegados (sin acentos ni entidades HTML). Si el modelo
+    no devuelve términos, se busca con la pregunta completa. La consulta
+    queda vacía si tampoco la pregunta tiene términos: no hay que ejecutarla.
+    """
+    consulta = consulta_lucene(extraer_terminos(pregunta)) or consulta_lucene(pregunta.split())
+    return CYPHER_BUSQUEDA, {"indice": INDICE_SUBTIPOS, "consulta": consulta, "limite": limite}
 
 
 # ============================================================
 # 2. Ejecutar consulta en Neo4j
 # ============================================================
-def ejecutar_cypher(query):
+def ejecutar_cypher(query, params=None):
     with driver.session() as session:
-        result = session.run(query)
+        result = session.run(query, params or {})
         return list(result)
 
+def buscar_subtipos(terminos, limite=20):
+    """
+    Búsqueda rankeada en el índice: registros con `s` (Subtipo) y `score`,
+    de mayor a menor relevancia. `terminos` es una lista de palabras o frases.
+    """
+    consulta = consulta_lucene(terminos)
+    if not consulta:
+        return []
+    return ejecutar_cypher(CYPHER_BUSQUEDA, {"indice": INDICE_SUBTIPOS, "consulta": consulta, "limite": limite})
+
 
 # ============================================================
 # 3. Síntesis final de los textos encontrados
@@ -116,12 +142,13 @@ def preguntar_normativa(pregunta):
     print("\n=== PREGUNTA ===")
     print(pregunta)
 
-    print("\n=== Generando Cypher semántico… ===")
-    cypher = generar_cypher_semantico(pregunta)
-    print(cypher)
+    print("\n=== Generando consulta semántica… ===")
+    cypher, params = generar_cypher_semantico(pregunta)
+    print(f"Índice {params['indice']}: {params['consulta']}")
 
     print("\n=== Ejecutando consulta… ===")
-    resultados = ejecutar_cypher(cypher)
+    # Una consulta Lucene vacía es un error de parseo en queryNodes
+    resultados = ejecutar_cypher(cypher, params) if params["consulta"] else []
     print(f"{len(resultados)} nodos relevantes encontrados.")
 
     print("\n=== Sintetizando respuesta final… ===")
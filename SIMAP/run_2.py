@@ -2,7 +2,10 @@
 # Construcción de un grafo de conocimiento SIMAP (servicios PAMI) con flujo ADK
 
 from neo4j import GraphDatabase
+import hashlib
 import json
+import os
+import sys
 
 # ============================================
 # 1. Conexión a Neo4j
@@ -14,6 +17,9 @@ PASSWORD = "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g"
 driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
 context = {}
 
+# Hash por registro de la última carga, para refrescos incrementales
+MANIFIESTO_PATH = "manifiesto_simap.json"
+
 # ============================================
 # 2. Funciones estilo ADK
 # ============================================
@@ -40,44 +46,148 @@ def approve_construction_plan(plan: dict):
 # ============================================
 # 3. Construcción del grafo desde JSON
 # ============================================
-def construct_domain_graph():
+def hash_texto(texto: str):
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+def hash_registro(r: dict):
+    return hash_texto(json.dumps(r, sort_keys=True, ensure_ascii=False, default=str))
+
+def cargar_manifiesto():
+    if not os.path.exists(MANIFIESTO_PATH):
+        return {}
+    with open(MANIFIESTO_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def guardar_manifiesto(manifiesto: dict):
+    tmp = f"{MANIFIESTO_PATH}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False)
+    os.replace(tmp, MANIFIESTO_PATH)
+
+def campos_textuales(r: dict):
+    for campo, valor in r.items():
+        if campo not in ["SERVICIO", "TIPO", "SUBTIPO", "ID_SUB"] and valor:
+            texto = str(valor).strip()
+            if texto:
+                yield campo, texto
+
+def id_subtipo(r: dict):
+    # Mismo valor y tipo (int de datos.json) que usa run_II_simap.py
+    return r.get("ID_SUB") or r.get("SUBTIPO", "").strip()
+
+def clave_registro(r: dict):
+    # Solo la clave del manifiesto va como texto (las claves JSON son strings)
+    return str(id_subtipo(r))
+
+def desenlazar_subtipo(session, id_sub):
+    """Quita la jerarquía y los campos de un subtipo que cambió, antes de recargarlo."""
+    session.run("""
+        MATCH (:Tipo)-[rel:TIENE_SUBTIPO]->(:Subtipo {id_sub:$id_sub}) DELETE rel
+    """, id_sub=id_sub)
+    session.run("""
+        MATCH (:Subtipo {id_sub:$id_sub})-[rel:TIENE_CAMPO]->(:Campo) DELETE rel
+    """, id_sub=id_sub)
+
+def cargar_registro(session, r: dict):
+    servicio = r.get("SERVICIO", "").strip()
+    tipo = r.get("TIPO", "").strip()
+    subtipo = r.get("SUBTIPO", "").strip()
+    id_sub = id_subtipo(r)
+
+    # Crear jerarquía principal (Subtipo por ID_SUB: renombrarlo no crea otro nodo)
+    session.run("""
+        MERGE (s:Servicio {nombre:$servicio})
+        MERGE (t:Tipo {nombre:$tipo})
+        MERGE (st:Subtipo {id_sub:$id_sub})
+        SET st.nombre = $subtipo
+        MERGE (s)-[:TIENE_TIPO]->(t)
+        MERGE (t)-[:TIENE_SUBTIPO]->(st)
+    """, servicio=servicio, tipo=tipo, subtipo=subtipo, id_sub=id_sub)
+
+    # Crear campos textuales (el hash permite borrar textos obsoletos en modo incremental)
+    for campo, texto in campos_textuales(r):
+        session.run("""
+            MERGE (c:Campo {nombre:$campo})
+            MERGE (txt:Contenido {texto:$texto})
+            SET txt.hash = $hash
+            MERGE (st:Subtipo {id_sub:$id_sub})
+            MERGE (st)-[:TIENE_CAMPO]->(c)
+            MERGE (c)-[:DESCRIBE]->(txt)
+        """, campo=campo, texto=texto, hash=hash_texto(texto), id_sub=id_sub)
+
+def construct_domain_graph(incremental: bool = False):
+    """
+    Sin `incremental` vacía la base y carga todo. Con `incremental` compara
+    cada registro (por ID_SUB) contra el manifiesto de la carga anterior y
+    solo vuelve a cargar los nuevos o modificados: a un subtipo modificado
+    se le quitan antes sus relaciones de jerarquía y campos, así un cambio
+    de Tipo no lo deja colgando de los dos. Los subtipos cuyo ID_SUB ya no
+    aparece, los textos, las relaciones Servicio-Tipo sin registros que las
+    respalden y los tipos y servicios que quedan vacíos se eliminan.
+    """
     plan = context.get("approved_construction_plan")
     json_path = plan["data_source"]
 
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)["RECORDS"]
 
+    previo = cargar_manifiesto() if incremental else {}
+    if previo and any("id_sub" not in v for v in previo.values()):
+        # Manifiesto anterior a que Subtipo se identificara por el ID_SUB numérico
+        print("⚠️ Manifiesto de una versión anterior: se hace la carga completa.")
+        incremental, previo = False, {}
+    actual = {}
+
     with driver.session() as session:
-        session.run("MATCH (n) DETACH DELETE n")
-        print("🧹 Base limpiada.")
+        if not incremental:
+            session.run("MATCH (n) DETACH DELETE n")
+            print("🧹 Base limpiada.")
 
+        cargados = 0
         for r in data:
-            servicio = r.get("SERVICIO", "").strip()
-            tipo = r.get("TIPO", "").strip()
-            subtipo = r.get("SUBTIPO", "").strip()
+            clave = clave_registro(r)
+            h = hash_registro(r)
+            actual[clave] = {
+                "id_sub": id_subtipo(r),
+                "hash": h,
+                "subtipo": r.get("SUBTIPO", "").strip(),
+                "servicio": r.get("SERVICIO", "").strip(),
+                "tipo": r.get("TIPO", "").strip(),
+                "textos": [hash_texto(t) for _, t in campos_textuales(r)],
+            }
+            if previo.get(clave, {}).get("hash") == h:
+                continue
+            if clave in previo:
+                desenlazar_subtipo(session, previo[clave]["id_sub"])
+            cargar_registro(session, r)
+            cargados += 1
+
+        if incremental:
+            textos_vigentes = {t for v in actual.values() for t in v["textos"]}
+            ids_obsoletos = [previo[k]["id_sub"] for k in sorted(previo.keys() - actual.keys())]
+            textos_obsoletos = list({t for v in previo.values() for t in v.get("textos", [])} - textos_vigentes)
+            pares_vigentes = sorted({(v["servicio"], v["tipo"]) for v in actual.values()})
 
-            # Crear jerarquía principal
             session.run("""
-                MERGE (s:Servicio {nombre:$servicio})
-                MERGE (t:Tipo {nombre:$tipo})
-                MERGE (st:Subtipo {nombre:$subtipo})
-                MERGE (s)-[:TIENE_TIPO]->(t)
-                MERGE (t)-[:TIENE_SUBTIPO]->(st)
-            """, servicio=servicio, tipo=tipo, subtipo=subtipo)
-
-            # Crear campos textuales
-            for campo, valor in r.items():
-                if campo not in ["SERVICIO", "TIPO", "SUBTIPO", "ID_SUB"] and valor:
-                    texto = str(valor).strip()
-                    if texto:
-                        session.run("""
-                            MERGE (c:Campo {nombre:$campo})
-                            MERGE (txt:Contenido {texto:$texto})
-                            MERGE (st:Subtipo {nombre:$subtipo})
-                            MERGE (st)-[:TIENE_CAMPO]->(c)
-                            MERGE (c)-[:DESCRIBE]->(txt)
-                        """, campo=campo, texto=texto, subtipo=subtipo)
-        print("✅ Grafo SIMAP construido correctamente.")
+                UNWIND $ids AS id
+                MATCH (st:Subtipo {id_sub: id}) DETACH DELETE st
+            """, ids=ids_obsoletos)
+            session.run("""
+                UNWIND $hashes AS h
+                MATCH (txt:Contenido {hash: h}) DETACH DELETE txt
+            """, hashes=textos_obsoletos)
+            session.run("""
+                MATCH (s:Servicio)-[rel:TIENE_TIPO]->(t:Tipo)
+                WHERE NOT [s.nombre, t.nombre] IN $pares
+                DELETE rel
+            """, pares=[list(p) for p in pares_vigentes])
+            session.run("MATCH (t:Tipo) WHERE NOT (t)-[:TIENE_SUBTIPO]->() DETACH DELETE t")
+            session.run("MATCH (s:Servicio) WHERE NOT (s)-[:TIENE_TIPO]->() DETACH DELETE s")
+            print(f"🔄 {cargados} registros nuevos/modificados, "
+                  f"{len(ids_obsoletos)} subtipos y {len(textos_obsoletos)} textos eliminados.")
+
+    guardar_manifiesto(actual)
+    print("✅ Grafo SIMAP construido correctamente.")
 
 # ============================================
 # 4. Consulta simulada (sin LLM aún)
@@ -129,7 +239,7 @@ approved_construction_plan = {
 }
 approve_construction_plan(approved_construction_plan)
 
-construct_domain_graph()
+construct_domain_graph(incremental="--incremental" in sys.argv)
 
 # Ejemplo de preguntas
 query_graph("¿Cuáles son los requisitos?")
@@ -2,6 +2,7 @@ import json
 import os
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
+from texto_busqueda import INDICE_SUBTIPOS, texto_de_subtipo
 
 # Cargar variables de entorno
 load_dotenv()
@@ -40,12 +41,15 @@ def crear_nodos_y_relaciones(driver, data):
             MERGE (st:Subtipo {id_sub: $id_sub})
             SET st.nombre = $subtipo,
                 st.copete = $copete,
-                st.consiste = $consiste
+                st.consiste = $consiste,
+                st.texto_busqueda = $texto_busqueda
             """,
             id_sub=rec.get("ID_SUB"),
             subtipo=rec.get("SUBTIPO"),
             copete=rec.get("COPETE"),
-            consiste=rec.get("CONSISTE")
+            consiste=rec.get("CONSISTE"),
+            # Sin entidades HTML ni acentos: "protesis" encuentra "pr&oacute;tesis"
+            texto_busqueda=texto_de_subtipo(rec.get("SUBTIPO"), rec.get("COPETE"), rec.get("CONSISTE"))
         )
 
         # Crear relación (Servicio)-[:TIENE_TIPO]->(Tipo)
@@ -76,6 +80,22 @@ def crear_nodos_y_relaciones(driver, data):
         print(f"Total de {len(data['RECORDS'])} registros procesados exitosamente.")
 
 
+def crear_indice_texto(driver):
+    """
+    Índice full-text (Lucene) sobre Subtipo.texto_busqueda, el texto plegado
+    de nombre, copete y consiste. Lo usa agente1_simap.buscar_subtipos.
+    """
+    with driver.session() as session:
+        # Reemplaza al índice anterior sobre los textos crudos
+        session.run("DROP INDEX subtipo_texto IF EXISTS").consume()
+        session.run(f"""
+            CREATE FULLTEXT INDEX {INDICE_SUBTIPOS} IF NOT EXISTS
+            FOR (st:Subtipo) ON EACH [st.texto_busqueda]
+            OPTIONS {{indexConfig: {{`fulltext.analyzer`: 'standard-folding'}}}}
+        """).consume()
+        session.run("CALL db.awaitIndexes(300)").consume()
+
+
 def consulta_prueba(driver):
     """
     Ejecuta una consulta de prueba: MATCH (s:Subtipo) RETURN s LIMIT 5
@@ -116,6 +136,9 @@ if __name__ == "__main__":
         print("\nCreando nodos y relaciones en Neo4j...")
         crear_nodos_y_relaciones(driver, data)
 
+        print("\nCreando índice full-text de Subtipo...")
+        crear_indice_texto(driver)
+
         # Ejecutar consulta de prueba
         print("\nEjecutando consulta de prueba...")
         consulta_prueba(driver)
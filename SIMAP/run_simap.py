@@ -1,5 +1,11 @@
 import os
 import json
+import time
+import random
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import openai
 from neo4j import GraphDatabase
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
@@ -9,10 +15,17 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # === CONFIGURACIÓN ===
+# EMBEDDINGS_LOCAL=1 usa vectores deterministas sin llamar a OpenAI (pruebas locales)
+EMBEDDINGS_LOCAL = os.getenv("EMBEDDINGS_LOCAL") == "1"
+EMBEDDING_BATCH = int(os.getenv("EMBEDDING_BATCH", "64"))
+EMBEDDING_CONCURRENCIA = int(os.getenv("EMBEDDING_CONCURRENCIA", "4"))
+EMBEDDING_REINTENTOS = 5
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
+if not OPENAI_API_KEY and not EMBEDDINGS_LOCAL:
     raise ValueError("OPENAI_API_KEY no está configurada en las variables de entorno.")
-os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
+if OPENAI_API_KEY:
+    os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
@@ -22,8 +35,34 @@ if not NEO4J_PASSWORD:
 
 driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
+class EmbeddingsLocales:
+    """
+    Reemplazo determinista de OpenAIEmbeddings: el mismo texto da siempre el
+    mismo vector unitario (derivado de sha256), con la misma dimensión.
+    """
+    def __init__(self, dimensions=1536):
+        self.dimensions = dimensions
+
+    def _vector(self, texto):
+        valores = []
+        bloque = 0
+        while len(valores) < self.dimensions:
+            digest = hashlib.sha256(f"{bloque}:{texto}".encode("utf-8")).digest()
+            valores.extend(b / 127.5 - 1.0 for b in digest)
+            bloque += 1
+        valores = valores[:self.dimensions]
+        norma = math.sqrt(sum(v * v for v in valores)) or 1.0
+        return [v / norma for v in valores]
+
+    def embed_documents(self, textos):
+        return [self._vector(t) for t in textos]
+
 # Inicializar embeddings y splitter
-embedding_model = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+if EMBEDDINGS_LOCAL:
+    embedding_model = EmbeddingsLocales()
+else:
+    # Sin reintentos internos del cliente: el único backoff es embed_with_retry
+    embedding_model = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, max_retries=0)
 splitter = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=64)
 
 # Funciones para carga de datos
@@ -77,20 +116,67 @@ def insert_record(tx, rec):
         id_sub=rec["ID_SUB"]
     )
 
-def add_embedding_property(tx, id_sub, embedding_vector):
+def add_embeddings_batch(tx, rows):
     tx.run(
         """
-        MATCH (d:Tramite {id_sub: $id_sub})
-        SET d.embedding = $vec
+        UNWIND $rows AS row
+        MATCH (d:Tramite {id_sub: row.id_sub})
+        SET d.embedding = row.vec
         """,
-        id_sub=id_sub,
-        vec=embedding_vector
+        rows=rows
     )
 
+# Errores de OpenAI que vale la pena reintentar (429, red, timeouts, 5xx)
+REINTENTABLES = (openai.RateLimitError, openai.APIConnectionError,
+                 openai.APITimeoutError, openai.InternalServerError)
+
+def embed_with_retry(textos):
+    for intento in range(EMBEDDING_REINTENTOS):
+        try:
+            return embedding_model.embed_documents(textos)
+        except REINTENTABLES as e:
+            if intento == EMBEDDING_REINTENTOS - 1:
+                raise
+            espera = min(60, 2 ** intento) + random.uniform(0, 1)
+            print(f"Reintento {intento + 1} de embeddings en {espera:.1f}s: {e}")
+            time.sleep(espera)
+
+def texts_to_embed(records):
+    """(id_sub, primer chunk de CONSISTE + PAUTAS) de cada registro con texto."""
+    pendientes = []
+    for rec in records:
+        text = ((rec.get("CONSISTE") or "") + "\n" + (rec.get("PAUTAS") or "")).strip()
+        if text:
+            pendientes.append((rec["ID_SUB"], splitter.split_text(text)[0]))
+    return pendientes
+
+def generate_embeddings(session, records, batch_size=EMBEDDING_BATCH, concurrency=EMBEDDING_CONCURRENCIA):
+    """
+    Embeddings en lotes de batch_size textos, con hasta `concurrency` llamadas
+    en vuelo; cada lote terminado se escribe con un solo UNWIND.
+    Devuelve la dimensión de los vectores (None si no hubo textos).
+    """
+    pendientes = texts_to_embed(records)
+    lotes = [pendientes[i:i + batch_size] for i in range(0, len(pendientes), batch_size)]
+    dimensions = None
+    escritos = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futuros = {pool.submit(embed_with_retry, [t for _, t in lote]): lote for lote in lotes}
+        for futuro in as_completed(futuros):
+            lote = futuros[futuro]
+            vectores = futuro.result()
+            rows = [{"id_sub": id_sub, "vec": vec} for (id_sub, _), vec in zip(lote, vectores)]
+            session.execute_write(add_embeddings_batch, rows)
+            dimensions = len(vectores[0])
+            escritos += len(rows)
+            print(f"Embeddings: {escritos}/{len(pendientes)}")
+    return dimensions
+
 def create_vector_index(tx, label="Tramite", prop="embedding", dimensions=1536):
     tx.run(
         f"""
-        CREATE VECTOR INDEX idx_{label}_{prop}
+        CREATE VECTOR INDEX idx_{label}_{prop} IF NOT EXISTS
         FOR (n:{label})
         ON (n.{prop})
         OPTIONS {{ indexConfig: {{ `vector.dimensions`: {dimensions}, `vector.similarity_function`: 'cosine' }} }}
@@ -106,18 +192,11 @@ with driver.session() as session:
     for rec in data["RECORDS"]:
         session.execute_write(insert_record, rec)
 
-    # Generación de embeddings y actualización de nodos
-    for rec in data["RECORDS"]:
-        id_sub = rec["ID_SUB"]
-        text = (rec.get("CONSISTE","") + "\n" + rec.get("PAUTAS","")).strip()
-        if not text:
-            continue
-        chunks = splitter.split_text(text)
-        first_chunk = chunks[0]
-        vec = embedding_model.embed_documents([first_chunk])[0]
-        session.execute_write(add_embedding_property, id_sub, vec)
+    # Generación de embeddings por lotes y actualización de nodos
+    dimensions = generate_embeddings(session, data["RECORDS"])
 
     # Crear índice vectorial
-    session.execute_write(create_vector_index)
+    if dimensions:
+        session.execute_write(create_vector_index, dimensions=dimensions)
 
 driver.close()
@@ -0,0 +1,38 @@
+# texto_busqueda.py
+# Normalización compartida entre la carga (run_II_simap.py) y las consultas
+# (agente1_simap.py): lo que se indexa y lo que se busca se pliegan igual.
+
+import html
+import re
+import unicodedata
+
+# Índice full-text sobre Subtipo.texto_busqueda
+INDICE_SUBTIPOS = "subtipo_busqueda"
+
+ESPECIALES_LUCENE = re.compile(r'([+\-!(){}\[\]^"~*?:\\/&|])')
+
+def plegar_texto(texto):
+    """
+    Decodifica entidades HTML (datos.json trae &ntilde;, &uacute;, ...),
+    quita acentos y pasa a minúsculas: "Afiliaci&oacute;n" → "afiliacion".
+    """
+    texto = html.unescape(texto or "").replace("\xa0", " ")
+    sin_acentos = unicodedata.normalize("NFKD", texto)
+    sin_acentos = "".join(c for c in sin_acentos if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", sin_acentos).strip().lower()
+
+def texto_de_subtipo(nombre, copete, consiste):
+    return plegar_texto(" ".join(t for t in (nombre, copete, consiste) if t))
+
+def consulta_lucene(terminos):
+    """
+    Arma la consulta del índice a partir de términos sueltos: cada uno plegado
+    y escapado; las frases van entre comillas. Coincide con cualquiera (OR).
+    """
+    partes = []
+    for termino in terminos:
+        plegado = ESPECIALES_LUCENE.sub(r"\\\1", plegar_texto(termino))
+        if not plegado:
+            continue
+        partes.append(f'"{plegado}"' if " " in plegado else plegado)
+    return " OR ".join(partes)
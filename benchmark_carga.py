@@ -0,0 +1,114 @@
+# benchmark_carga.py
+# Mide los loaders (convertir_bd_kg, conver_0, gene_ask.construct_domain_graph)
+# sobre un directorio de CSV generado con generar_datos_pami.py, contra un
+# Neo4j local. Cada loader corre en un subproceso con el directorio de datos
+# como cwd; se registran duración, filas/s y pico de memoria (RSS).
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime
+from neo4j import GraphDatabase
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+# Por defecto contra un Neo4j local: nunca contra la instancia compartida
+os.environ.setdefault("NEO4J_URI", "bolt://localhost:7687")
+os.environ.setdefault("NEO4J_USER", "neo4j")
+
+LOADERS = {
+    "convertir_bd_kg": [sys.executable, os.path.join(RAIZ, "convertir_bd_kg.py")],
+    "conver_0": [sys.executable, os.path.join(RAIZ, "conver_0.py")],
+    "gene_ask": [sys.executable, "-c", "import gene_ask; gene_ask.construct_domain_graph()"],
+}
+
+RESULTADOS = "benchmark_resultados.csv"
+
+# =======================================================
+# 1. Preparación
+# =======================================================
+def contar_filas(datos):
+    """Filas de datos por CSV (sin encabezado)."""
+    filas = {}
+    for archivo in sorted(os.listdir(datos)):
+        if archivo.endswith(".csv"):
+            with open(os.path.join(datos, archivo), encoding="utf-8", newline="") as f:
+                filas[archivo] = sum(1 for _ in csv.reader(f)) - 1
+    return filas
+
+def limpiar_base(lote=10000):
+    # Cada loader arranca de una base vacía (gene_ask hace MERGE y no borra)
+    driver = GraphDatabase.driver(os.environ["NEO4J_URI"],
+                                  auth=(os.environ["NEO4J_USER"], os.environ.get("NEO4J_PASSWORD", "")))
+    with driver.session() as session:
+        session.run(f"""
+            MATCH (n) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF {lote} ROWS
+        """).consume()
+    driver.close()
+
+# =======================================================
+# 2. Ejecución medida
+# =======================================================
+def medir(comando, datos, log):
+    """
+    Corre el loader y devuelve (segundos, código de salida, pico RSS en MB).
+    os.wait4 entrega el rusage de ese hijo solo, no el acumulado.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get("PYTHONPATH")])))
+    inicio = time.perf_counter()
+    with open(log, "w", encoding="utf-8") as salida:
+        proceso = subprocess.Popen(comando, cwd=datos, env=env, stdout=salida, stderr=subprocess.STDOUT)
+        _, estado, uso = os.wait4(proceso.pid, 0)
+    segundos = time.perf_counter() - inicio
+    proceso.returncode = codigo = os.waitstatus_to_exitcode(estado)  # ya recolectado por wait4
+    # ru_maxrss está en KB en Linux
+    return segundos, codigo, uso.ru_maxrss / 1024
+
+def registrar(resultado, path=RESULTADOS):
+    nuevo = not os.path.exists(path)
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(resultado))
+        if nuevo:
+            writer.writeheader()
+        writer.writerow(resultado)
+
+def benchmark(datos, loaders, repeticiones=1, resultados=RESULTADOS):
+    filas = contar_filas(datos)
+    total = sum(filas.values())
+    print(f"{datos}: {total} filas en {len(filas)} archivos")
+    print(json.dumps(filas, indent=2))
+
+    for nombre in loaders:
+        for rep in range(1, repeticiones + 1):
+            limpiar_base()
+            log = os.path.join(datos, f"benchmark_{nombre}_{rep}.log")
+            segundos, codigo, rss_mb = medir(LOADERS[nombre], datos, log)
+            resultado = {
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "loader": nombre,
+                "datos": os.path.abspath(datos),
+                "repeticion": rep,
+                "filas": total,
+                "segundos": round(segundos, 2),
+                "filas_por_segundo": round(total / segundos, 1) if segundos else 0,
+                "pico_rss_mb": round(rss_mb, 1),
+                "codigo_salida": codigo,
+            }
+            registrar(resultado, resultados)
+            estado = "ok" if codigo == 0 else f"falló (ver {log})"
+            print(f"{nombre} #{rep}: {segundos:.1f}s, {resultado['filas_por_segundo']} filas/s, "
+                  f"RSS {rss_mb:.0f} MB, {estado}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de los loaders de CSV a Neo4j.")
+    parser.add_argument("datos", help="Carpeta con los CSV (ver generar_datos_pami.py)")
+    parser.add_argument("--loaders", nargs="+", choices=list(LOADERS), default=list(LOADERS))
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--resultados", default=RESULTADOS, help="CSV donde se agregan los resultados")
+    args = parser.parse_args()
+
+    benchmark(args.datos, args.loaders, args.repeticiones, args.resultados)
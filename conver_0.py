@@ -2,18 +2,30 @@
 # Versión automática completa sin ADK
 
 import os
+import sys
 import pandas as pd
 from neo4j import GraphDatabase
+from tipos_entidades import coercionar
+from refresco_incremental import (
+    Manifiesto, descartar_manifiesto, upsert_nodos_tx, borrar_nodos_tx,
+    borrar_relaciones_tx, lotes_de,
+)
 
 # ============================================
 # 1. Conexión Neo4j
 # ============================================
-URI = "neo4j+s://b0df6e44.databases.neo4j.io"
-USER = "neo4j"
-PASSWORD = "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g"
+URI = os.getenv("NEO4J_URI", "neo4j+s://b0df6e44.databases.neo4j.io")
+USER = os.getenv("NEO4J_USER", "neo4j")
+PASSWORD = os.getenv("NEO4J_PASSWORD", "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g")
 
 driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
 
+# Filas por lote en modo streaming
+BATCH_SIZE = 5000
+
+# Manifiesto de hashes de este loader (convertir_bd_kg.py arma otro grafo y usa el suyo)
+MANIFIESTO_PATH = "manifiesto_conver_0.sqlite"
+
 # ============================================
 # 2. Utilidades
 # ============================================
@@ -52,14 +64,27 @@ def validate_csv(df, archivo):
     if df.isna().all().all():
         raise ValueError(f"El archivo {archivo} no tiene datos útiles.")
 
-def load_data(entities):
+def load_data(entities, streaming=False, batch_size=BATCH_SIZE):
+    """
+    En modo streaming solo se valida el primer lote y se guarda un DataFrame
+    vacío con las columnas; las filas se leen luego en build_graph.
+    """
     dataframes = {}
     for entidad, archivo in entities.items():
-        df = pd.read_csv(archivo)
-        validate_csv(df, archivo)
-        dataframes[entidad] = df
+        if streaming:
+            df = coercionar(entidad, pd.read_csv(archivo, nrows=batch_size))
+            validate_csv(df, archivo)
+            dataframes[entidad] = df.iloc[0:0]
+        else:
+            df = coercionar(entidad, pd.read_csv(archivo))
+            validate_csv(df, archivo)
+            dataframes[entidad] = df
     return dataframes
 
+def read_batches(entidad, archivo, batch_size=BATCH_SIZE):
+    for chunk in pd.read_csv(archivo, chunksize=batch_size):
+        yield coercionar(entidad, chunk)
+
 def validate_relationships(relaciones, dataframes):
     for rel in relaciones:
         df_rel = dataframes[rel["from"]]
@@ -70,43 +95,228 @@ def validate_relationships(relaciones, dataframes):
         if rel["to_col"] not in dataframes[destino].columns:
             raise ValueError(f"Columna destino {rel['to_col']} no existe en entidad {destino}.")
 
+def entity_keys(relationships, dataframes):
+    claves = set()
+    for entidad, df in dataframes.items():
+        propia = f"id_{entidad.lower()}"
+        if propia in df.columns:
+            claves.add((entidad, propia))
+    for rel in relationships:
+        claves.add((rel["to"], rel["to_col"]))
+    return sorted(claves)
+
 # ============================================
 # 3. Construcción del grafo
 # ============================================
 
-def build_graph(entities, relationships, dataframes):
+def create_indexes(session, relationships, dataframes, timeout=300):
+    claves = entity_keys(relationships, dataframes)
+    for entidad, col in claves:
+        session.run(
+            f"CREATE CONSTRAINT {entidad.lower()}_{col}_unico IF NOT EXISTS "
+            f"FOR (n:{entidad}) REQUIRE n.{col} IS UNIQUE"
+        )
+        print(f"Constraint: {entidad}.{col}")
+
+    # El origen de cada relación se busca por la columna id_* foránea
+    for rel in relationships:
+        if (rel["from"], rel["from_col"]) in claves:
+            continue
+        session.run(
+            f"CREATE INDEX {rel['from'].lower()}_{rel['from_col']}_idx IF NOT EXISTS "
+            f"FOR (n:{rel['from']}) ON (n.{rel['from_col']})"
+        )
+        print(f"Índice: {rel['from']}.{rel['from_col']}")
+
+    session.run("CALL db.awaitIndexes($timeout)", timeout=timeout)
+    print("Índices en línea.")
+
+def _create_nodes_tx(tx, entidad, filas):
+    tx.run(f"UNWIND $rows AS row CREATE (n:{entidad}) SET n = row", rows=filas)
+
+def _create_relationships_tx(tx, rel, filas):
+    tx.run(
+        f"""
+        UNWIND $rows AS row
+        MATCH (a:{rel['from']}) WHERE a.{rel['from_col']} = row.from_id
+        MATCH (b:{rel['to']}) WHERE b.{rel['to_col']} = row.to_id
+        CREATE (a)-[:{rel['type']}]->(b)
+        """,
+        rows=filas,
+    )
+
+def build_graph_streaming(session, entities, relationships, batch_size=BATCH_SIZE, manifiesto=None):
+    print(f"Cargando nodos en streaming (lotes de {batch_size})...")
+    for entidad, archivo in entities.items():
+        total = 0
+        for chunk in read_batches(entidad, archivo, batch_size):
+            filas = [
+                {k: v for k, v in fila.items() if pd.notna(v)}
+                for fila in chunk.to_dict("records")
+            ]
+            session.execute_write(_create_nodes_tx, entidad, filas)
+            register_hashes(manifiesto, entidad, chunk)
+            total += len(filas)
+        print(f"{entidad}: {total} nodos")
+
+    print("Cargando relaciones en streaming...")
+    for rel in relationships:
+        # from_col y to_col suelen ser la misma columna
+        columnas = list(dict.fromkeys([rel["from_col"], rel["to_col"]]))
+        for chunk in read_batches(rel["from"], rel["file"], batch_size):
+            filas = [
+                {"from_id": fila[rel["from_col"]], "to_id": fila[rel["to_col"]]}
+                for fila in chunk[columnas].dropna().to_dict("records")
+            ]
+            if filas:
+                session.execute_write(_create_relationships_tx, rel, filas)
+        print(f"Relaciones creadas: {rel['type']}")
+
+def build_graph(entities, relationships, dataframes, streaming=False, batch_size=BATCH_SIZE,
+                manifiesto_path=None):
+    """
+    Con `manifiesto_path` se registran los hashes de cada fila en la misma
+    pasada de carga, como punto de partida para refresh_graph.
+    """
+    manifiesto = Manifiesto(manifiesto_path) if manifiesto_path else None
     print("Limpiando base...")
     with driver.session() as session:
         session.run("MATCH (n) DETACH DELETE n")
 
-        print("Cargando nodos...")
-        for entidad, df in dataframes.items():
-            for _, fila in df.iterrows():
-                props = {k: v for k, v in fila.items() if pd.notna(v)}
-                session.run(f"CREATE (n:{entidad} $props)", props=props)
-            print(f"{entidad}: {len(df)} nodos")
+        print("Creando índices...")
+        create_indexes(session, relationships, dataframes)
 
-        print("Cargando relaciones...")
-        for rel in relationships:
-            origen = rel["from"]
-            destino = rel["to"]
-            archivo = rel["file"]
-            df = pd.read_csv(archivo)
-
-            for _, fila in df.iterrows():
-                session.run(
-                    f"""
-                    MATCH (a:{origen}) WHERE a.{rel['from_col']} = $from_id
-                    MATCH (b:{destino}) WHERE b.{rel['to_col']} = $to_id
-                    CREATE (a)-[:{rel['type']}]->(b)
-                    """,
-                    {"from_id": fila[rel["from_col"]], "to_id": fila[rel["to_col"]]},
-                )
-
-            print(f"Relaciones creadas: {rel['type']}")
+        if streaming:
+            build_graph_streaming(session, entities, relationships, batch_size, manifiesto)
+        else:
+            build_graph_rows(session, relationships, dataframes, manifiesto)
 
+    if manifiesto:
+        manifiesto.confirmar()
+        print(f"Manifiesto guardado en {manifiesto_path}")
+    else:
+        descartar_manifiesto(MANIFIESTO_PATH)
     print("Grafo construido completamente.")
 
+def build_graph_rows(session, relationships, dataframes, manifiesto=None):
+    print("Cargando nodos...")
+    for entidad, df in dataframes.items():
+        register_hashes(manifiesto, entidad, df)
+        for _, fila in df.iterrows():
+            props = {k: v for k, v in fila.items() if pd.notna(v)}
+            session.run(f"CREATE (n:{entidad} $props)", props=props)
+        print(f"{entidad}: {len(df)} nodos")
+
+    print("Cargando relaciones...")
+    for rel in relationships:
+        origen = rel["from"]
+        destino = rel["to"]
+        archivo = rel["file"]
+        df = coercionar(origen, pd.read_csv(archivo))
+
+        for _, fila in df.iterrows():
+            session.run(
+                f"""
+                MATCH (a:{origen}) WHERE a.{rel['from_col']} = $from_id
+                MATCH (b:{destino}) WHERE b.{rel['to_col']} = $to_id
+                CREATE (a)-[:{rel['type']}]->(b)
+                """,
+                {"from_id": fila[rel["from_col"]], "to_id": fila[rel["to_col"]]},
+            )
+
+        print(f"Relaciones creadas: {rel['type']}")
+
+# ============================================
+# 3b. Refresco incremental (manifiesto de hashes)
+# ============================================
+
+def primary_key(entidad, columnas):
+    propia = f"id_{entidad.lower()}"
+    if propia in columnas:
+        return propia
+    return next((c for c in columnas if c.startswith("id_")), None)
+
+def register_hashes(manifiesto, entidad, df):
+    if manifiesto is None:
+        return
+    clave = primary_key(entidad, df.columns)
+    if clave is not None:
+        manifiesto.registrar(entidad, clave, df)
+
+def _relink_tx(tx, rel, valores):
+    tx.run(
+        f"""
+        UNWIND $valores AS v
+        MATCH (a:{rel['from']}) WHERE a.{rel['from_col']} = v
+        MATCH (b:{rel['to']}) WHERE b.{rel['to_col']} = v
+        MERGE (a)-[:{rel['type']}]->(b)
+        """,
+        valores=valores,
+    )
+
+def refresh_graph(entities, relationships, dataframes, batch_size=BATCH_SIZE,
+                  manifiesto_path=MANIFIESTO_PATH):
+    """
+    Alternativa a build_graph que no vacía la base: compara los CSV contra el
+    manifiesto, hace upsert de las filas nuevas o modificadas, borra las que
+    desaparecieron y vuelve a enlazar solo las relaciones afectadas.
+    """
+    manifiesto = Manifiesto(manifiesto_path, comparar=True)
+    claves = {}
+    cambios = {}   # entidad -> filas nuevas o modificadas
+    nuevas = {}    # entidad -> claves que no estaban en el manifiesto
+
+    with driver.session() as session:
+        print("Creando índices...")
+        create_indexes(session, relationships, dataframes)
+
+        print("Aplicando cambios de nodos...")
+        for entidad, archivo in entities.items():
+            clave = claves[entidad] = primary_key(entidad, dataframes[entidad].columns)
+            if clave is None:
+                print(f"{entidad}: sin columna id_*, se omite")
+                continue
+
+            cambios[entidad], nuevas[entidad] = [], set()
+
+            for chunk in read_batches(entidad, archivo, batch_size):
+                cambiadas, claves_nuevas = manifiesto.comparar_lote(entidad, clave, chunk)
+                filas = [
+                    {k: v for k, v in fila.items() if pd.notna(v)}
+                    for fila in cambiadas.to_dict("records")
+                ]
+                if not filas:
+                    continue
+                session.execute_write(upsert_nodos_tx, entidad, clave, filas)
+                cambios[entidad].extend(filas)
+                nuevas[entidad].update(claves_nuevas)
+
+            bajas = 0
+            for lote in manifiesto.eliminadas(entidad, batch_size):
+                session.execute_write(borrar_nodos_tx, entidad, clave, lote)
+                bajas += len(lote)
+            print(f"{entidad}: {len(cambios[entidad])} altas/modificaciones, {bajas} bajas")
+
+        print("Aplicando cambios de relaciones...")
+        for rel in relationships:
+            origen = rel["from"]
+            if origen not in cambios:
+                continue
+            ids = [f[claves[origen]] for f in cambios[origen]]
+            if not ids and not nuevas.get(rel["to"]):
+                continue
+            for lote in lotes_de(ids, batch_size):
+                session.execute_write(borrar_relaciones_tx, origen, claves[origen], rel["type"], lote)
+
+            valores = {f[rel["from_col"]] for f in cambios[origen] if rel["from_col"] in f}
+            valores |= nuevas.get(rel["to"], set())
+            for lote in lotes_de(sorted(valores, key=str), batch_size):
+                session.execute_write(_relink_tx, rel, lote)
+            print(f"Relaciones re-enlazadas: {rel['type']} ({len(valores)} claves)")
+
+    manifiesto.confirmar()
+    print("Refresco incremental completo.")
+
 # ============================================
 # 4. Consultas básicas
 # ============================================
@@ -139,7 +349,7 @@ def query_graph(pregunta):
 # 5. Pipeline principal
 # ============================================
 
-def ejecutar_pipeline():
+def ejecutar_pipeline(streaming=False, incremental=False, manifiesto=False):
     print("\nDetectando archivos CSV...")
     csv_files = [f for f in os.listdir() if f.endswith(".csv")]
     if not csv_files:
@@ -154,7 +364,7 @@ def ejecutar_pipeline():
     print("Entidades:", entities)
 
     print("\nCargando datos...")
-    dataframes = load_data(entities)
+    dataframes = load_data(entities, streaming=streaming)
 
     print("\nDetectando relaciones...")
     relationships = detect_relationships(entities, dataframes)
@@ -166,7 +376,11 @@ def ejecutar_pipeline():
     validate_relationships(relationships, dataframes)
 
     print("\nConstruyendo grafo...")
-    build_graph(entities, relationships, dataframes)
+    if incremental:
+        refresh_graph(entities, relationships, dataframes)
+    else:
+        build_graph(entities, relationships, dataframes, streaming=streaming,
+                    manifiesto_path=MANIFIESTO_PATH if manifiesto else None)
 
     print("\nConsultas de ejemplo:")
     query_graph("¿Qué proveedores presentan más trámites demorados?")
@@ -175,4 +389,6 @@ def ejecutar_pipeline():
     print("\nPipeline automático completo.")
 
 if __name__ == "__main__":
-    ejecutar_pipeline()
+    # --manifiesto: al reconstruir, registra los hashes para un --incremental posterior
+    ejecutar_pipeline(streaming="--stream" in sys.argv, incremental="--incremental" in sys.argv,
+                      manifiesto="--manifiesto" in sys.argv)
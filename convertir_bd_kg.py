@@ -1,17 +1,32 @@
 # grafo_protesis_auto_semantico.py
 import os
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import pandas as pd
 from neo4j import GraphDatabase
+from refresco_incremental import (
+    Manifiesto, descartar_manifiesto, upsert_nodos_tx, borrar_nodos_tx,
+    borrar_relaciones_tx, lotes_de,
+)
+from tipos_entidades import coercionar
 
 # =======================================================
 # 1. Conexión Neo4j
 # =======================================================
-URI = "neo4j+s://b0df6e44.databases.neo4j.io"
-USER = "neo4j"
-PASSWORD = "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g"
+URI = os.getenv("NEO4J_URI", "neo4j+s://b0df6e44.databases.neo4j.io")
+USER = os.getenv("NEO4J_USER", "neo4j")
+PASSWORD = os.getenv("NEO4J_PASSWORD", "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g")
 
 driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
 
+# Filas por transacción en el modo por lotes (UNWIND)
+BATCH_SIZE = 5000
+
+# Manifiesto de hashes de este loader (conver_0.py arma otro grafo y usa el suyo)
+MANIFIESTO_PATH = "manifiesto_convertir_bd_kg.sqlite"
+
 # =======================================================
 # 2. Diccionario automático de entidades (detecta CSV)
 # =======================================================
@@ -20,6 +35,45 @@ def detectar_entidades():
     entidades = {os.path.splitext(f)[0].capitalize(): f for f in archivos}
     return entidades
 
+# =======================================================
+# 2b. Contexto de carga: cada CSV se parsea una sola vez
+# =======================================================
+class ContextoCarga:
+    """
+    Comparte los DataFrames entre detección de relaciones, carga de nodos y
+    carga de relaciones. Cada DataFrame o chunk pasa por `coercionar`
+    (tipos_entidades.py): ids como Int64, fechas como Date/LocalDateTime y
+    enums validados, iguales en todas las fases y en todos los loaders.
+    """
+    def __init__(self, entidades):
+        self.entidades = entidades
+        self._frames = {}
+        self._columnas = {}
+        self._locks = {}
+
+    def columnas(self, entidad):
+        # Solo el encabezado: alcanza para detectar relaciones sin cargar el archivo
+        if entidad not in self._columnas:
+            self._columnas[entidad] = pd.read_csv(self.entidades[entidad], nrows=0).columns
+        return self._columnas[entidad]
+
+    def dataframe(self, entidad):
+        # Lock por entidad: en modo paralelo dos tareas no parsean el mismo archivo
+        with self._locks.setdefault(entidad, threading.Lock()):
+            if entidad not in self._frames:
+                archivo = self.entidades[entidad]
+                self._frames[entidad] = coercionar(entidad, pd.read_csv(archivo))
+        return self._frames[entidad]
+
+    def leer_en_lotes(self, entidad, tamanio):
+        """Itera el CSV en DataFrames de `tamanio` filas sin guardarlos en caché."""
+        archivo = self.entidades[entidad]
+        for chunk in pd.read_csv(archivo, chunksize=tamanio):
+            yield coercionar(entidad, chunk)
+
+    def liberar(self):
+        self._frames.clear()
+
 # =======================================================
 # 3. Motor semántico
 # =======================================================
@@ -36,12 +90,25 @@ SEMANTIC_RULES = {
 # =======================================================
 # 4. Detectar relaciones con reglas semánticas
 # =======================================================
-def detectar_relaciones(entidades):
+def clave_primaria(entidad, columnas):
+    """
+    Devuelve la columna id_* que identifica a la entidad: id_<entidad> si
+    existe, si no la primera id_* que no sea clave foránea en SEMANTIC_RULES.
+    """
+    propia = f"id_{entidad.lower()}"
+    if propia in columnas:
+        return propia
+    for col in columnas:
+        if col.startswith("id_") and (entidad, col) not in SEMANTIC_RULES:
+            return col
+    return None
+
+def detectar_relaciones(entidades, contexto=None):
+    contexto = contexto or ContextoCarga(entidades)
     relaciones = []
 
     for entidad, archivo in entidades.items():
-        df = pd.read_csv(archivo)
-        columnas = df.columns
+        columnas = contexto.columnas(entidad)
 
         for col in columnas:
             if not col.startswith("id_"):
@@ -59,46 +126,346 @@ def detectar_relaciones(entidades):
                         "type": rel_name,
                         "file": archivo,
                         "from_col": col,
+                        "from_key": clave_primaria(entidad, columnas),
                         "to_col": f"id_{target_entity.lower()}"
                     })
 
     return relaciones
 
 # =======================================================
-# 5. Construcción del grafo
+# 5. Constraints e índices
+# =======================================================
+def claves_de_entidades(relaciones):
+    """Pares (entidad, columna id_*) que identifican nodos según SEMANTIC_RULES."""
+    claves = set()
+    for rel in relaciones:
+        claves.add((rel["to"], rel["to_col"]))
+        if rel["from_key"]:
+            claves.add((rel["from"], rel["from_key"]))
+    return sorted(claves)
+
+def crear_constraints(session, relaciones, modo="batch", timeout=300):
+    for entidad, col in claves_de_entidades(relaciones):
+        session.run(
+            f"CREATE CONSTRAINT {entidad.lower()}_{col}_unico IF NOT EXISTS "
+            f"FOR (n:{entidad}) REQUIRE n.{col} IS UNIQUE"
+        )
+        print(f"Constraint: {entidad}.{col}")
+
+    # El modo fila ubica el origen por la clave foránea → índice de rango
+    if modo == "fila":
+        for rel in relaciones:
+            session.run(
+                f"CREATE INDEX {rel['from'].lower()}_{rel['from_col']}_idx IF NOT EXISTS "
+                f"FOR (n:{rel['from']}) ON (n.{rel['from_col']})"
+            )
+            print(f"Índice: {rel['from']}.{rel['from_col']}")
+
+    session.run("CALL db.awaitIndexes($timeout)", timeout=timeout)
+    print("Índices en línea.")
+
+# =======================================================
+# 6. Carga por lotes (UNWIND)
 # =======================================================
-def construir_grafo(entidades, relaciones):
+def lotes(filas, tamanio):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamanio:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def filas_nodos(df):
+    for fila in df.to_dict("records"):
+        yield {k: v for k, v in fila.items() if pd.notna(v)}
+
+def filas_relaciones(df, rel):
+    # El origen se ubica por su clave primaria y el destino por la clave foránea
+    pares = df[[rel["from_key"], rel["from_col"]]].dropna()
+    for fila in pares.to_dict("records"):
+        yield {"from_id": fila[rel["from_key"]], "to_id": fila[rel["from_col"]]}
+
+def _crear_nodos_tx(tx, entidad, filas):
+    tx.run(f"UNWIND $rows AS row CREATE (n:{entidad}) SET n = row", rows=filas)
+
+def _crear_relaciones_tx(tx, rel, filas, operacion="CREATE"):
+    tx.run(
+        f"""
+        UNWIND $rows AS row
+        MATCH (a:{rel['from']} {{{rel['from_key']}: row.from_id}})
+        MATCH (b:{rel['to']} {{{rel['to_col']}: row.to_id}})
+        {operacion} (a)-[:{rel['type']}]->(b)
+        """,
+        rows=filas,
+    )
+
+def _merge_relaciones_tx(tx, rel, filas):
+    _crear_relaciones_tx(tx, rel, filas, operacion="MERGE")
+
+def cargar_por_lotes(session, tx_func, objetivo, filas, batch_size):
+    total = 0
+    for lote in lotes(filas, batch_size):
+        session.execute_write(tx_func, objetivo, lote)
+        total += len(lote)
+    return total
+
+def reportar_velocidad(etiqueta, total, inicio):
+    segundos = time.perf_counter() - inicio
+    velocidad = total / segundos if segundos > 0 else 0
+    print(f"{etiqueta}: {total} filas en {segundos:.2f}s ({velocidad:.0f} filas/s)")
+
+# =======================================================
+# 7. Construcción del grafo
+# =======================================================
+def construir_grafo(entidades, relaciones, modo="batch", batch_size=BATCH_SIZE, contexto=None,
+                    manifiesto_path=None, workers=1):
+    """
+    Con `manifiesto_path` los hashes de cada fila se registran durante la
+    misma pasada de carga (sin releer los CSV), como punto de partida para
+    los refrescos incrementales.
+    """
+    contexto = contexto or ContextoCarga(entidades)
+    manifiesto = Manifiesto(manifiesto_path) if manifiesto_path else None
     with driver.session() as session:
 
         print("Limpiando base…")
         session.run("MATCH (n) DETACH DELETE n")
 
-        print("Cargando nodos…")
-        for entidad, archivo in entidades.items():
-            df = pd.read_csv(archivo)
-            for _, fila in df.iterrows():
-                props = {k: v for k, v in fila.items() if pd.notna(v)}
-                session.run(f"CREATE (n:{entidad} $props)", props=props)
-            print(f"{entidad}: {len(df)} nodos")
+        print("Creando constraints…")
+        crear_constraints(session, relaciones, modo)
 
-        print("Cargando relaciones…")
-        for rel in relaciones:
-            df = pd.read_csv(rel["file"])
-            for _, fila in df.iterrows():
-                session.run(
-                    f"""
-                    MATCH (a:{rel['from']}) WHERE a.{rel['from_col']} = $from_id
-                    MATCH (b:{rel['to']})   WHERE b.{rel['to_col']}   = $to_id
-                    CREATE (a)-[:{rel['type']}]->(b)
-                    """,
-                    {"from_id": fila[rel["from_col"]], "to_id": fila[rel["to_col"]]},
-                )
-            print(f"Relaciones creadas: {rel['type']}")
+        if modo == "fila":
+            construir_grafo_por_fila(session, contexto, relaciones, manifiesto)
+        elif workers > 1:
+            construir_grafo_paralelo(contexto, relaciones, batch_size, workers, modo == "stream", manifiesto)
+        elif modo == "stream":
+            construir_grafo_streaming(session, contexto, relaciones, batch_size, manifiesto)
+        else:
+            construir_grafo_por_lotes(session, contexto, relaciones, batch_size, manifiesto)
+
+    if manifiesto:
+        manifiesto.confirmar()
+        print(f"Manifiesto guardado en {manifiesto_path}")
+    else:
+        descartar_manifiesto(MANIFIESTO_PATH)
+    contexto.liberar()
 
     print("Grafo construido completamente.")
 
+def construir_grafo_por_lotes(session, contexto, relaciones, batch_size, manifiesto=None):
+    print(f"Cargando nodos (lotes de {batch_size})…")
+    for entidad in contexto.entidades:
+        inicio = time.perf_counter()
+        df = contexto.dataframe(entidad)
+        registrar_hashes(manifiesto, contexto, entidad, df)
+        total = cargar_por_lotes(session, _crear_nodos_tx, entidad, filas_nodos(df), batch_size)
+        reportar_velocidad(f"{entidad} (nodos)", total, inicio)
+
+    print(f"Cargando relaciones (lotes de {batch_size})…")
+    for rel in relaciones:
+        inicio = time.perf_counter()
+        df = contexto.dataframe(rel["from"])
+        total = cargar_por_lotes(session, _crear_relaciones_tx, rel, filas_relaciones(df, rel), batch_size)
+        reportar_velocidad(f"{rel['type']} (relaciones)", total, inicio)
+
+def construir_grafo_streaming(session, contexto, relaciones, batch_size, manifiesto=None):
+    # Cada chunk del CSV es un lote: la memoria depende de batch_size, no del archivo
+    print(f"Cargando nodos en streaming (lotes de {batch_size})…")
+    for entidad in contexto.entidades:
+        inicio = time.perf_counter()
+        total = 0
+        for chunk in contexto.leer_en_lotes(entidad, batch_size):
+            lote = list(filas_nodos(chunk))
+            session.execute_write(_crear_nodos_tx, entidad, lote)
+            registrar_hashes(manifiesto, contexto, entidad, chunk)
+            total += len(lote)
+        reportar_velocidad(f"{entidad} (nodos)", total, inicio)
+
+    print(f"Cargando relaciones en streaming (lotes de {batch_size})…")
+    for rel in relaciones:
+        inicio = time.perf_counter()
+        total = 0
+        for chunk in contexto.leer_en_lotes(rel["from"], batch_size):
+            lote = list(filas_relaciones(chunk, rel))
+            if lote:
+                session.execute_write(_crear_relaciones_tx, rel, lote)
+            total += len(lote)
+        reportar_velocidad(f"{rel['type']} (relaciones)", total, inicio)
+
 # =======================================================
-# 6. Consultas de ejemplo
+# 7b. Carga paralela (un pool de hilos, una sesión por tarea)
+# =======================================================
+def _lotes_de_entidad(contexto, entidad, batch_size, streaming):
+    if streaming:
+        for chunk in contexto.leer_en_lotes(entidad, batch_size):
+            yield chunk
+    else:
+        df = contexto.dataframe(entidad)
+        for inicio in range(0, len(df), batch_size):
+            yield df.iloc[inicio:inicio + batch_size]
+
+def _tarea_nodos(contexto, entidad, batch_size, streaming, manifiesto=None):
+    inicio = time.perf_counter()
+    total = 0
+    with driver.session() as session:
+        for chunk in _lotes_de_entidad(contexto, entidad, batch_size, streaming):
+            lote = list(filas_nodos(chunk))
+            session.execute_write(_crear_nodos_tx, entidad, lote)
+            registrar_hashes(manifiesto, contexto, entidad, chunk)
+            total += len(lote)
+    reportar_velocidad(f"{entidad} (nodos)", total, inicio)
+    return time.perf_counter() - inicio
+
+def _tarea_relaciones(contexto, rel, batch_size, streaming):
+    inicio = time.perf_counter()
+    total = 0
+    with driver.session() as session:
+        for chunk in _lotes_de_entidad(contexto, rel["from"], batch_size, streaming):
+            lote = list(filas_relaciones(chunk, rel))
+            if lote:
+                session.execute_write(_crear_relaciones_tx, rel, lote)
+            total += len(lote)
+    reportar_velocidad(f"{rel['type']} (relaciones)", total, inicio)
+    return time.perf_counter() - inicio
+
+def construir_grafo_paralelo(contexto, relaciones, batch_size, workers, streaming=False, manifiesto=None):
+    """
+    Las entidades son independientes y se cargan en paralelo. Cada relación
+    se lanza apenas terminan sus dos extremos (DAG derivado de SEMANTIC_RULES).
+    """
+    print(f"Carga paralela con {workers} workers (lotes de {batch_size})…")
+    inicio = time.perf_counter()
+    duraciones = []
+    pendientes = list(relaciones)
+    terminadas = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        en_curso = {
+            pool.submit(_tarea_nodos, contexto, entidad, batch_size, streaming, manifiesto): entidad
+            for entidad in contexto.entidades
+        }
+        while en_curso:
+            listas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in listas:
+                tarea = en_curso.pop(futuro)
+                duraciones.append(futuro.result())
+                if isinstance(tarea, str):
+                    terminadas.add(tarea)
+
+            for rel in [r for r in pendientes if {r["from"], r["to"]} <= terminadas]:
+                pendientes.remove(rel)
+                en_curso[pool.submit(_tarea_relaciones, contexto, rel, batch_size, streaming)] = rel
+
+    total = time.perf_counter() - inicio
+    secuencial = sum(duraciones)
+    print(f"Tiempo total: {total:.2f}s | suma de tareas: {secuencial:.2f}s | "
+          f"speedup: {secuencial / total if total > 0 else 0:.2f}x")
+
+def construir_grafo_por_fila(session, contexto, relaciones, manifiesto=None):
+    print("Cargando nodos…")
+    for entidad in contexto.entidades:
+        df = contexto.dataframe(entidad)
+        registrar_hashes(manifiesto, contexto, entidad, df)
+        for _, fila in df.iterrows():
+            props = {k: v for k, v in fila.items() if pd.notna(v)}
+            session.run(f"CREATE (n:{entidad} $props)", props=props)
+        print(f"{entidad}: {len(df)} nodos")
+
+    print("Cargando relaciones…")
+    for rel in relaciones:
+        df = contexto.dataframe(rel["from"])
+        for _, fila in df.iterrows():
+            session.run(
+                f"""
+                MATCH (a:{rel['from']}) WHERE a.{rel['from_col']} = $from_id
+                MATCH (b:{rel['to']})   WHERE b.{rel['to_col']}   = $to_id
+                CREATE (a)-[:{rel['type']}]->(b)
+                """,
+                {"from_id": fila[rel["from_col"]], "to_id": fila[rel["to_col"]]},
+            )
+        print(f"Relaciones creadas: {rel['type']}")
+
+# =======================================================
+# 8. Refresco incremental (manifiesto de hashes por clave)
+# =======================================================
+def registrar_hashes(manifiesto, contexto, entidad, df):
+    if manifiesto is None:
+        return
+    clave = clave_primaria(entidad, contexto.columnas(entidad))
+    if clave is not None:
+        manifiesto.registrar(entidad, clave, df)
+
+def refrescar_grafo(entidades, relaciones, batch_size=BATCH_SIZE, contexto=None,
+                    manifiesto_path=MANIFIESTO_PATH):
+    """
+    Aplica solo el delta entre los CSV actuales y el último manifiesto:
+    upsert de filas nuevas o modificadas, borrado de las que ya no están y
+    re-enlace de las relaciones de las filas tocadas. No vacía la base.
+    """
+    contexto = contexto or ContextoCarga(entidades)
+    manifiesto = Manifiesto(manifiesto_path, comparar=True)
+    modificadas = {}   # entidad -> ids de filas nuevas o modificadas
+    nuevas = {}        # entidad -> ids que no existían en el manifiesto
+
+    with driver.session() as session:
+        print("Verificando constraints…")
+        crear_constraints(session, relaciones)
+
+        print("Aplicando cambios de nodos…")
+        for entidad in contexto.entidades:
+            clave = clave_primaria(entidad, contexto.columnas(entidad))
+            if clave is None:
+                print(f"{entidad}: sin columna id_*, se omite en modo incremental")
+                continue
+
+            inicio = time.perf_counter()
+            modificadas[entidad], nuevas[entidad] = [], set()
+
+            for chunk in contexto.leer_en_lotes(entidad, batch_size):
+                cambiadas, ids_nuevos = manifiesto.comparar_lote(entidad, clave, chunk)
+                if cambiadas.empty:
+                    continue
+                session.execute_write(upsert_nodos_tx, entidad, clave, list(filas_nodos(cambiadas)))
+                modificadas[entidad].extend(cambiadas[clave].tolist())
+                nuevas[entidad].update(ids_nuevos)
+
+            bajas = 0
+            for lote in manifiesto.eliminadas(entidad, batch_size):
+                session.execute_write(borrar_nodos_tx, entidad, clave, lote)
+                bajas += len(lote)
+
+            print(f"{entidad}: {len(modificadas[entidad])} altas/modificaciones, "
+                  f"{bajas} bajas ({time.perf_counter() - inicio:.2f}s)")
+
+        print("Aplicando cambios de relaciones…")
+        for rel in relaciones:
+            if rel["from"] not in modificadas:
+                continue
+            ids = modificadas[rel["from"]]
+            for lote in lotes_de(ids, batch_size):
+                session.execute_write(borrar_relaciones_tx, rel["from"], rel["from_key"], rel["type"], lote)
+
+            # Se re-enlazan los orígenes modificados y los que apuntan a destinos nuevos
+            ids_origen = set(ids)
+            ids_destino = nuevas.get(rel["to"], set())
+            if not ids_origen and not ids_destino:
+                continue
+            total = 0
+            for chunk in contexto.leer_en_lotes(rel["from"], batch_size):
+                mascara = chunk[rel["from_key"]].isin(ids_origen) | chunk[rel["from_col"]].isin(ids_destino)
+                lote = list(filas_relaciones(chunk[mascara], rel))
+                if lote:
+                    session.execute_write(_merge_relaciones_tx, rel, lote)
+                total += len(lote)
+            print(f"{rel['type']}: {total} relaciones re-enlazadas")
+
+    manifiesto.confirmar()
+    print(f"Refresco incremental completo. Manifiesto: {manifiesto_path}")
+
+# =======================================================
+# 9. Consultas de ejemplo
 # =======================================================
 def ejemplo_consultas():
     print("\nConsultas de ejemplo:")
@@ -112,20 +479,42 @@ def ejemplo_consultas():
             print(r)
 
 # =======================================================
-# 7. Ejecución del pipeline automático
+# 10. Ejecución del pipeline automático
 # =======================================================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga los CSV del directorio como grafo en Neo4j.")
+    parser.add_argument("--modo", choices=["batch", "stream", "fila"], default="batch",
+                        help="batch: UNWIND por lotes; stream: lotes leídos del CSV en chunks; "
+                             "fila: una sentencia por fila")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Filas por transacción en modos batch y stream")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Hilos para cargar entidades en paralelo (modos batch y stream)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Aplica solo el delta contra el manifiesto en lugar de reconstruir")
+    parser.add_argument("--manifiesto", nargs="?", const=MANIFIESTO_PATH, default=None,
+                        help="Al reconstruir, registra los hashes de cada fila para --incremental "
+                             f"(por defecto en {MANIFIESTO_PATH})")
+    args = parser.parse_args()
+
     print("Detectando entidades…")
     entidades = detectar_entidades()
     print(entidades)
+    contexto = ContextoCarga(entidades)
 
     print("\nDetectando relaciones semánticas…")
-    relaciones = detectar_relaciones(entidades)
+    relaciones = detectar_relaciones(entidades, contexto)
     for r in relaciones:
         print(r)
 
-    print("\nConstruyendo grafo…")
-    construir_grafo(entidades, relaciones)
+    if args.incremental:
+        print("\nRefrescando grafo (incremental)…")
+        refrescar_grafo(entidades, relaciones, batch_size=args.batch_size, contexto=contexto,
+                        manifiesto_path=args.manifiesto or MANIFIESTO_PATH)
+    else:
+        print("\nConstruyendo grafo…")
+        construir_grafo(entidades, relaciones, modo=args.modo, batch_size=args.batch_size,
+                        contexto=contexto, manifiesto_path=args.manifiesto, workers=args.workers)
 
     ejemplo_consultas()
 
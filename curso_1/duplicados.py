@@ -0,0 +1,110 @@
+# duplicados.py
+# Detección de documentos duplicados antes de la extracción: primero por hash
+# exacto del texto normalizado y después por similitud (MinHash sobre
+# shingles de palabras + LSH por bandas). Usado por gen_schema_txt.py para
+# extraer una sola vez cada grupo de copias.
+
+import re
+import zlib
+import hashlib
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+SHINGLE_PALABRAS = 5
+PERMUTACIONES = 128
+BANDAS = 32                 # 32 bandas de 4 filas: candidatos desde ~0.45 de similitud
+UMBRAL_DUPLICADO = 0.9      # Jaccard estimado a partir del cual se consideran la misma norma
+
+_PRIMO = (1 << 61) - 1
+_rng = np.random.default_rng(20240790)
+_A = _rng.integers(1, 1 << 32, size=PERMUTACIONES, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, size=PERMUTACIONES, dtype=np.uint64)
+
+# ============================================
+# 1. Normalización y firmas
+# ============================================
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes y con los espacios colapsados."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip()
+
+def hash_exacto(texto: str) -> str:
+    return hashlib.sha256(normalizar(texto).encode("utf-8")).hexdigest()
+
+def shingles(texto: str, k: int = SHINGLE_PALABRAS) -> np.ndarray:
+    palabras = re.findall(r"\w+", normalizar(texto))
+    if len(palabras) < k:
+        palabras = palabras + [""] * (k - len(palabras))
+    valores = {zlib.crc32(" ".join(palabras[i:i + k]).encode("utf-8"))
+               for i in range(len(palabras) - k + 1)}
+    return np.fromiter(valores, dtype=np.uint64, count=len(valores))
+
+def firma_minhash(texto: str) -> np.ndarray:
+    # (a·x + b) mod p con x < 2^32 y a, b < 2^32: no desborda uint64
+    x = shingles(texto)
+    return ((np.outer(_A, x) + _B[:, None]) % _PRIMO).min(axis=1)
+
+def similitud(firma_a: np.ndarray, firma_b: np.ndarray) -> float:
+    """Jaccard estimado entre dos documentos."""
+    return float(np.mean(firma_a == firma_b))
+
+# ============================================
+# 2. Agrupamiento
+# ============================================
+
+def _representante(nombres: List[str]) -> str:
+    # "X.txt" antes que "X (1).txt"
+    return min(nombres, key=lambda n: (len(n), n))
+
+def agrupar_duplicados(documentos: Dict[str, str], umbral: float = UMBRAL_DUPLICADO) -> Dict[str, List[str]]:
+    """
+    Devuelve {representante: [duplicados]} para todos los documentos (los
+    que no tienen copias quedan con la lista vacía). Los idénticos se juntan
+    por hash; entre los distintos, LSH propone candidatos y se confirman
+    con la similitud MinHash >= umbral.
+    """
+    padre = {nombre: nombre for nombre in documentos}
+
+    def raiz(nombre):
+        while padre[nombre] != nombre:
+            padre[nombre] = padre[padre[nombre]]
+            nombre = padre[nombre]
+        return nombre
+
+    def unir(a, b):
+        padre[raiz(a)] = raiz(b)
+
+    por_hash = defaultdict(list)
+    for nombre, texto in documentos.items():
+        por_hash[hash_exacto(texto)].append(nombre)
+    unicos = []
+    for nombres in por_hash.values():
+        for otro in nombres[1:]:
+            unir(otro, nombres[0])
+        unicos.append(nombres[0])
+
+    firmas = {nombre: firma_minhash(documentos[nombre]) for nombre in unicos}
+    filas = PERMUTACIONES // BANDAS
+    cubetas = defaultdict(list)
+    for nombre, firma in firmas.items():
+        for banda in range(BANDAS):
+            cubetas[(banda, firma[banda * filas:(banda + 1) * filas].tobytes())].append(nombre)
+    for nombres in cubetas.values():
+        for i, a in enumerate(nombres):
+            for b in nombres[i + 1:]:
+                if raiz(a) != raiz(b) and similitud(firmas[a], firmas[b]) >= umbral:
+                    unir(a, b)
+
+    grupos = defaultdict(list)
+    for nombre in documentos:
+        grupos[raiz(nombre)].append(nombre)
+    resultado = {}
+    for nombres in grupos.values():
+        rep = _representante(nombres)
+        resultado[rep] = sorted(n for n in nombres if n != rep)
+    return {rep: resultado[rep] for rep in sorted(resultado)}
@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 
@@ -16,28 +17,63 @@ if not URI or not USER or not PASSWORD:
 
 driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
 
+# Nodos por transacción al borrar (evita superar el límite de memoria de Aura)
+BATCH_SIZE = int(os.getenv("BORRADO_LOTE", "10000"))
+
+# Labels a borrar, p. ej.: python gen_borrar_schema.py Documento Ley
+# Sin argumentos se borra todo el grafo y todas las constraints.
+LABELS = sys.argv[1:]
+
 
 # --------------------------------------------------
 # 2. Borrar todos los nodos y relaciones
 # --------------------------------------------------
-def delete_all_nodes(tx):
-    tx.run("MATCH (n) DETACH DELETE n")
+def count_nodes(tx, label=None):
+    match = f"MATCH (n:`{label}`)" if label else "MATCH (n)"
+    return tx.run(f"{match} RETURN count(n) AS total").single()["total"]
+
+
+def delete_batch(tx, label, batch_size):
+    match = f"MATCH (n:`{label}`)" if label else "MATCH (n)"
+    result = tx.run(
+        f"{match} WITH n LIMIT $limite DETACH DELETE n RETURN count(*) AS borrados",
+        limite=batch_size,
+    )
+    return result.single()["borrados"]
+
+
+def delete_nodes_in_batches(session, label=None, batch_size=BATCH_SIZE):
+    """Borra en transacciones de batch_size nodos hasta vaciar el label (o el grafo)."""
+    total = session.execute_read(count_nodes, label)
+    borrados = 0
+    nombre = label or "(todos)"
+    while True:
+        n = session.execute_write(delete_batch, label, batch_size)
+        if n == 0:
+            break
+        borrados += n
+        print(f"  {nombre}: {borrados}/{total} nodos eliminados")
+    return borrados
 
 
 # --------------------------------------------------
 # 3. Listar constraints
 # --------------------------------------------------
-def list_constraints(tx):
-    result = tx.run("SHOW CONSTRAINTS YIELD name RETURN name")
-    return [record["name"] for record in result]
+def list_constraints(tx, labels=None):
+    result = tx.run("SHOW CONSTRAINTS YIELD name, labelsOrTypes RETURN name, labelsOrTypes")
+    return [
+        record["name"] for record in result
+        if not labels or set(record["labelsOrTypes"] or []) & set(labels)
+    ]
 
 
 # --------------------------------------------------
-# 4. Borrar constraint por nombre
+# 4. Borrar constraints por nombre
 # --------------------------------------------------
-def drop_constraint(tx, name):
-    query = f"DROP CONSTRAINT {name} IF EXISTS"
-    tx.run(query)
+def drop_constraints(tx, names):
+    # Todas las bajas en una sola transacción (un único round trip de commit)
+    for name in names:
+        tx.run(f"DROP CONSTRAINT `{name}` IF EXISTS")
 
 
 # --------------------------------------------------
@@ -45,12 +81,17 @@ def drop_constraint(tx, name):
 # --------------------------------------------------
 with driver.session() as session:
 
-    print("Eliminando todos los nodos y relaciones...")
-    session.execute_write(delete_all_nodes)
+    if LABELS:
+        print(f"Eliminando nodos de los labels {LABELS} en lotes de {BATCH_SIZE}...")
+        for label in LABELS:
+            delete_nodes_in_batches(session, label)
+    else:
+        print(f"Eliminando todos los nodos y relaciones en lotes de {BATCH_SIZE}...")
+        delete_nodes_in_batches(session)
     print("✔ Nodos y relaciones eliminados.\n")
 
     print("Listado de constraints...")
-    constraints = session.execute_read(list_constraints)
+    constraints = session.execute_read(list_constraints, LABELS)
 
     if not constraints:
         print("No se encontraron constraints.")
@@ -60,8 +101,8 @@ with driver.session() as session:
             print(" -", c)
 
         print("\nEliminando constraints...")
+        session.execute_write(drop_constraints, constraints)
         for c in constraints:
-            session.execute_write(drop_constraint, c)
             print(f"✔ Eliminada: {c}")
 
 driver.close()
@@ -1,15 +1,26 @@
 import os
 import glob
 import json
+import re
+import time
+import random
+import sqlite3
+import hashlib
+import threading
 import unicodedata
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Tuple, Set, Dict
+import openai
 from openai import OpenAI
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from duplicados import agrupar_duplicados
 
 # Carga variables de entorno
 load_dotenv()
-client = OpenAI()
+# Los reintentos los maneja llamar_llm (con backoff y limitador de tokens)
+client = OpenAI(max_retries=0)
 
 # --- CONFIGURACIÓN DEL PROYECTO ---
 # Ahora la ruta de la carpeta se toma de la variable de entorno CARPETA_TXT
@@ -27,6 +38,35 @@ LLM_MODEL = os.getenv("MODELO")
 if not LLM_MODEL:
     raise ValueError("La variable de entorno 'MODELO' (para el LLM) no está definida. Por favor, configúrala.")
 
+# Llamadas al LLM en paralelo: cantidad de archivos en vuelo y tope de
+# tokens por minuto de la cuenta (LLM_CONCURRENCIA=1 procesa de a uno)
+LLM_CONCURRENCIA = int(os.getenv("LLM_CONCURRENCIA", "4"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+LLM_REINTENTOS = int(os.getenv("LLM_REINTENTOS", "6"))
+# Tokens de salida que se reservan por llamada antes de conocer el uso real
+RESERVA_SALIDA = 2000
+
+# Los documentos largos se procesan por fragmentos de hasta CHUNK_CARACTERES,
+# solapados en CHUNK_SOLAPE caracteres y cortados en artículos o párrafos
+CHUNK_CARACTERES = int(os.getenv("CHUNK_CARACTERES", "12000"))
+CHUNK_SOLAPE = int(os.getenv("CHUNK_SOLAPE", "1000"))
+
+# Caché en disco de las respuestas del LLM (CACHE_LLM= vacío la desactiva).
+# Subir PROMPT_VERSION al cambiar los prompts o el post-proceso de los agentes.
+CACHE_LLM = os.getenv("CACHE_LLM", "cache_llm.sqlite")
+PROMPT_VERSION = "1"
+# Las extracciones se cachean por fragmento + hash del esquema maestro usado:
+# si el esquema cambia, se re-extrae. ESQUEMA_VERSION (opcional) reemplaza
+# ese hash para fijar la caché ante cambios menores del esquema; cambiarlo
+# fuerza a re-extraer.
+ESQUEMA_VERSION = os.getenv("ESQUEMA_VERSION", "")
+
+# Salida: "cypher" (grafo_generado.cypher, una sentencia por elemento),
+# "jsonl" (grafo_generado.jsonl, lotes para las plantillas UNWIND de
+# gen_subir_schma_a_neo.py) o "ambos"
+FORMATO_SALIDA = os.getenv("FORMATO_SALIDA", "cypher")
+LOTE_PAYLOAD = int(os.getenv("LOTE_PAYLOAD", "5000"))
+
 # Leer USER_GOAL desde goal.txt
 USER_GOAL = ""
 try:
@@ -66,6 +106,289 @@ def remove_accents(input_str: str) -> str:
     # Filtrar caracteres no combinables (elimina las tildes)
     return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
+# --- LLAMADAS AL LLM (LIMITADOR + REINTENTOS) ---
+
+class LimitadorTokens:
+    """
+    Balde de tokens compartido entre hilos: se llena a razón de
+    tokens_por_minuto / 60 por segundo. Cada llamada reserva una estimación
+    antes de salir y se corrige con el uso real al volver.
+    """
+    def __init__(self, tokens_por_minuto: int):
+        self.capacidad = tokens_por_minuto
+        self.disponibles = float(tokens_por_minuto)
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.disponibles = min(self.capacidad, self.disponibles + (ahora - self.ultimo) * self.capacidad / 60)
+        self.ultimo = ahora
+
+    def reservar(self, tokens: int):
+        # Una llamada más grande que el minuto entero espera al balde lleno
+        tokens = min(tokens, self.capacidad)
+        while True:
+            with self.lock:
+                self._recargar()
+                if self.disponibles >= tokens:
+                    self.disponibles -= tokens
+                    return
+                espera = (tokens - self.disponibles) * 60 / self.capacidad
+            time.sleep(espera)
+
+    def corregir(self, reservados: int, usados: int):
+        with self.lock:
+            self.disponibles -= usados - min(reservados, self.capacidad)
+
+limitador = LimitadorTokens(LLM_TPM)
+
+# 429, red, timeouts y 5xx: vale la pena reintentar
+REINTENTABLES = (openai.RateLimitError, openai.APIConnectionError,
+                 openai.APITimeoutError, openai.InternalServerError)
+
+def estimar_tokens(*textos: str) -> int:
+    # ~4 caracteres por token en castellano, más la respuesta
+    return sum(len(t) for t in textos) // 4 + RESERVA_SALIDA
+
+def _espera_reintento(error, intento: int) -> float:
+    # Si la API indica cuánto esperar (Retry-After), se respeta
+    respuesta = getattr(error, "response", None)
+    retry_after = respuesta.headers.get("retry-after") if respuesta is not None else None
+    try:
+        return float(retry_after) + random.uniform(0, 1)
+    except (TypeError, ValueError):
+        return min(60, 2 ** intento) + random.uniform(0, 1)
+
+class CacheLLM:
+    """
+    Respuestas ya parseadas del LLM en SQLite, direccionadas por contenido:
+    la clave es el hash de agente, versión de prompt, modelo y contenido
+    (los mensajes para el ontólogo; fragmento + hash del esquema, o
+    ESQUEMA_VERSION si está fijada, para el extractor). Guarda también los
+    tokens que costó cada respuesta, que es lo que se ahorra en cada
+    acierto, y la firma del esquema con que se extrajo, para avisar cuántas
+    extracciones fijadas con ESQUEMA_VERSION son de un esquema anterior.
+    """
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.llamadas = 0
+        self.tokens_ahorrados = 0
+        self.esquema_anterior = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False) if path else None
+        if self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS respuestas (
+                    clave TEXT PRIMARY KEY,
+                    agente TEXT,
+                    modelo TEXT,
+                    resultado TEXT,
+                    tokens INTEGER,
+                    esquema TEXT,
+                    creado TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            columnas = [c[1] for c in self.conn.execute("PRAGMA table_info(respuestas)")]
+            if "esquema" not in columnas:
+                # Caché creada antes de guardar la firma del esquema
+                self.conn.execute("ALTER TABLE respuestas ADD COLUMN esquema TEXT")
+            self.conn.commit()
+
+    @staticmethod
+    def clave(agente: str, llm_model: str, contenido) -> str:
+        datos = json.dumps([agente, PROMPT_VERSION, llm_model, contenido], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+    def leer(self, clave: str, esquema: str = None):
+        if not self.conn:
+            return None
+        with self.lock:
+            fila = self.conn.execute("SELECT resultado, tokens, esquema FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila:
+                self.aciertos += 1
+                self.tokens_ahorrados += fila[1]
+                if esquema and fila[2] != esquema:
+                    self.esquema_anterior += 1
+        return fila
+
+    def guardar(self, clave: str, agente: str, llm_model: str, resultado: str, tokens: int, esquema: str = None):
+        with self.lock:
+            self.llamadas += 1
+            if self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO respuestas (clave, agente, modelo, resultado, tokens, esquema) VALUES (?, ?, ?, ?, ?, ?)",
+                                  (clave, agente, llm_model, resultado, tokens, esquema))
+                self.conn.commit()
+
+cache = CacheLLM(CACHE_LLM)
+
+def llamar_llm(llm_model: str, messages: List[dict], response_format, agente: str,
+               contenido_cache=None, esquema: str = None):
+    """
+    Devuelve (respuesta parseada, tokens). Si la misma llamada ya está en la
+    caché no se llama a la API (tokens = 0); si no, se llama con limitador
+    de TPM y backoff exponencial y se guarda el resultado. La clave de caché
+    se arma con `contenido_cache` (por defecto, los mensajes completos).
+    """
+    clave = CacheLLM.clave(agente, llm_model, messages if contenido_cache is None else contenido_cache)
+    guardado = cache.leer(clave, esquema)
+    if guardado:
+        return response_format.model_validate_json(guardado[0]), 0
+
+    estimado = estimar_tokens(*(m["content"] for m in messages))
+    for intento in range(LLM_REINTENTOS):
+        limitador.reservar(estimado)
+        try:
+            completion = client.beta.chat.completions.parse(
+                model=llm_model,
+                messages=messages,
+                response_format=response_format,
+            )
+        except REINTENTABLES as e:
+            # La llamada fallida no consumió la reserva completa
+            limitador.corregir(estimado, 0)
+            if intento == LLM_REINTENTOS - 1:
+                raise
+            espera = _espera_reintento(e, intento)
+            print(f"  ⏳ Reintento {intento + 1} en {espera:.1f}s: {e.__class__.__name__}")
+            time.sleep(espera)
+            continue
+        tokens = completion.usage.total_tokens
+        limitador.corregir(estimado, tokens)
+        parsed = completion.choices[0].message.parsed
+        cache.guardar(clave, agente, llm_model, parsed.model_dump_json(), tokens, esquema)
+        return parsed, tokens
+
+def procesar_en_paralelo(funcion, tareas: Dict[Tuple[str, int], str], concurrencia: int = LLM_CONCURRENCIA) -> Dict[Tuple[str, int], tuple]:
+    """
+    Aplica funcion(filename, parte, texto) a cada fragmento (filename, parte)
+    con hasta `concurrencia` llamadas en vuelo. Devuelve los resultados
+    ordenados por (archivo, parte), así la salida no depende del orden en
+    que terminan.
+    """
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        futuros = {pool.submit(funcion, filename, parte, texto): (filename, parte)
+                   for (filename, parte), texto in tareas.items()}
+        for futuro in as_completed(futuros):
+            filename, parte = futuros[futuro]
+            resultados[(filename, parte)] = futuro.result()
+            print(f"  ✔ {filename} [parte {parte + 1}] ({len(resultados)}/{len(tareas)})")
+    return {clave: resultados[clave] for clave in sorted(resultados)}
+
+# --- FRAGMENTACIÓN (CHUNKS) ---
+
+# Un bloque nuevo empieza en un artículo, anexo, capítulo o considerando,
+# o después de una línea en blanco
+INICIO_BLOQUE = re.compile(r"^\s*(?:(?i:art[ií]culo|anexo|cap[ií]tulo)\b|Que\b|VISTO\b|CONSIDERANDO\b)")
+
+def dividir_en_bloques(texto: str) -> List[str]:
+    bloques, actual = [], []
+    fin_parrafo = False
+    for linea in texto.splitlines(keepends=True):
+        if not linea.strip():
+            if actual:
+                actual.append(linea)
+                fin_parrafo = True
+            continue
+        if actual and (fin_parrafo or INICIO_BLOQUE.match(linea)):
+            bloques.append("".join(actual))
+            actual = []
+        actual.append(linea)
+        fin_parrafo = False
+    if actual:
+        bloques.append("".join(actual))
+    return bloques
+
+# Corte de oración o de línea para alinear el comienzo del solape
+FIN_ORACION = re.compile(r"[.;:]\s+|\n")
+
+def _cola(texto: str, solape: int) -> str:
+    """
+    Los últimos `solape` caracteres de un fragmento. Si en el primer quinto
+    de esa ventana hay un fin de oración o de línea, el solape empieza ahí.
+    """
+    if solape == 0:
+        return ""
+    cola = texto[-solape:]
+    corte = FIN_ORACION.search(cola, 0, max(1, solape // 5))
+    return cola[corte.end():] if corte else cola
+
+def _empaquetar(piezas: List[str], limite: int, solape: int) -> List[str]:
+    # Greedy: se agregan piezas mientras entren en `limite`; cada fragmento
+    # nuevo arranca con la cola del anterior
+    chunks, actual, propio = [], "", False
+    for pieza in piezas:
+        if propio and len(actual) + len(pieza) > limite:
+            chunks.append(actual)
+            actual = _cola(actual, solape)
+        actual += pieza
+        propio = True
+    chunks.append(actual)
+    return chunks
+
+def dividir_en_chunks(texto: str, tamanio: int = CHUNK_CARACTERES, solape: int = CHUNK_SOLAPE) -> List[str]:
+    """
+    Agrupa bloques consecutivos (artículos, párrafos) en fragmentos de hasta
+    `tamanio` caracteres. Cada fragmento repite al principio los últimos
+    ~`solape` caracteres del anterior, alineados a una oración o línea si se
+    puede, para no cortar una relación entre dos artículos. Un bloque más
+    largo que `tamanio - solape` se corta por líneas.
+    """
+    if not 0 <= solape < tamanio:
+        raise ValueError(f"Se necesita 0 <= solape < tamanio (solape={solape}, tamanio={tamanio})")
+    if len(texto) <= tamanio:
+        return [texto]
+    paso = tamanio - solape
+    piezas = []
+    for bloque in dividir_en_bloques(texto):
+        if len(bloque) <= paso:
+            piezas.append(bloque)
+            continue
+        # Bloque demasiado largo (tablas, anexos): se corta por líneas y,
+        # si una línea sola no entra, por caracteres
+        for linea in bloque.splitlines(keepends=True):
+            piezas.extend(linea[i:i + paso] for i in range(0, len(linea), paso))
+
+    chunks = _empaquetar(piezas, tamanio, solape)
+    # Con la misma cantidad de fragmentos, el menor límite que alcanza: el
+    # texto queda repartido parejo y no sobra un último fragmento chico
+    bajo, alto = max(len(p) for p in piezas) + solape, tamanio
+    while bajo < alto:
+        medio = (bajo + alto) // 2
+        if len(_empaquetar(piezas, medio, solape)) <= len(chunks):
+            alto = medio
+        else:
+            bajo = medio + 1
+    return _empaquetar(piezas, alto, solape)
+
+def solape_compartido(anterior: str, siguiente: str, solape: int) -> int:
+    """Caracteres del final de `anterior` con los que empieza `siguiente` (hasta `solape`)."""
+    for n in range(min(solape, len(anterior), len(siguiente)), 0, -1):
+        if anterior.endswith(siguiente[:n]):
+            return n
+    return 0
+
+def verificar_solape(chunks: List[str], solape: int = CHUNK_SOLAPE) -> List[int]:
+    """
+    Índices de los cortes cuyo solape real es menor al esperado: el
+    fragmento siguiente debe empezar con al menos solape - solape/5
+    caracteres del final del anterior (o todo el anterior, si es más corto).
+    """
+    return [i for i, (a, b) in enumerate(zip(chunks, chunks[1:]))
+            if solape_compartido(a, b, solape) < min(solape, len(a)) - solape // 5]
+
+def fragmentar(txt_files: Dict[str, str]) -> Dict[Tuple[str, int], str]:
+    tareas = {}
+    for filename, content in txt_files.items():
+        chunks = dividir_en_chunks(content)
+        cortos = verificar_solape(chunks)
+        if cortos:
+            print(f"  ⚠️ {filename}: solape menor a {CHUNK_SOLAPE} caracteres en los cortes {cortos}")
+        for parte, chunk in enumerate(chunks):
+            tareas[(filename, parte)] = chunk
+    return tareas
+
 # --- 1. Carga de Archivos ---
 def read_txt_files(folder_path: str) -> Dict[str, str]:
     files_content = {}
@@ -120,6 +443,10 @@ class ExtractionResult(BaseModel):
 
 # --- 3. Agentes ---
 
+def firma_esquema(schema: SchemaDefinition) -> str:
+    datos = json.dumps([sorted(schema.node_labels), sorted(schema.relationship_types)], ensure_ascii=False)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()[:12]
+
 def run_ontology_agent(text_content: str, goal: str, known_labels: List[str], llm_model: str) -> Tuple[SchemaDefinition, int]:
     system_prompt = f"""
     Eres un Arquitecto de Datos experto en Neo4j.
@@ -137,29 +464,26 @@ def run_ontology_agent(text_content: str, goal: str, known_labels: List[str], ll
     4. Relaciones en UPPER_CASE con guiones bajos (ej. PROVOCA_EFECTO).
     """
     
-    content_sample = text_content[:15000]
-    
-    completion = client.beta.chat.completions.parse(
-        model=llm_model, # Usa la variable del modelo LLM
-        messages=[
+    schema, tokens = llamar_llm(
+        llm_model, # Usa la variable del modelo LLM
+        [
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Analiza y define el esquema:\n{content_sample}"},
+            {"role": "user", "content": f"Analiza y define el esquema:\n{text_content}"},
         ],
-        response_format=SchemaDefinition,
+        SchemaDefinition,
+        "ontologia",
     )
     
-    schema = completion.choices[0].message.parsed
-    
     # --- LIMPIEZA FORZADA (PYTHON) ---
     # Aunque el LLM falle, Python lo corrige aquí
     schema.node_labels = [remove_accents(l) for l in schema.node_labels]
     schema.relationship_types = [remove_accents(r) for r in schema.relationship_types]
     
-    tokens = completion.usage.total_tokens
     print(f"  [ONTÓLOGO] 📈 Tokens: {tokens} | Labels: {len(schema.node_labels)} | Rels: {len(schema.relationship_types)}")
     return schema, tokens
 
 def run_extraction_agent(text_content: str, schema: SchemaDefinition, llm_model: str) -> Tuple[ExtractionResult, int]:
+    firma = firma_esquema(schema)
     system_prompt = f"""
     Eres un experto en extracción de Grafos.
     Extrae instancias basándote en este esquema UNIFICADO:
@@ -171,19 +495,24 @@ def run_extraction_agent(text_content: str, schema: SchemaDefinition, llm_model:
     1. Genera IDs únicos en formato SNAKE_CASE_MAYUSCULA (ej. DIABETES_TIPO_2).
     2. **NO USES TILDES EN LOS LABELS NI RELACIONES** (ej. usa 'Condicion' no 'Condición').
     3. En las 'properties' (nombres descriptivos) SÍ puedes usar tildes.
+    4. El texto puede ser un fragmento de un documento más largo: arma los IDs
+       a partir del nombre de la entidad (no del fragmento) para que coincidan
+       entre fragmentos.
     """
     
-    completion = client.beta.chat.completions.parse(
-        model=llm_model, # Usa la variable del modelo LLM
-        messages=[
+    result, tokens = llamar_llm(
+        llm_model, # Usa la variable del modelo LLM
+        [
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Extrae los datos:\n{text_content[:30000]}"},
+            {"role": "user", "content": f"Extrae los datos:\n{text_content}"},
         ],
-        response_format=ExtractionResult,
+        ExtractionResult,
+        "extraccion",
+        # Clave: fragmento + esquema (ver ESQUEMA_VERSION)
+        contenido_cache=[ESQUEMA_VERSION or firma, text_content],
+        esquema=firma,
     )
     
-    result = completion.choices[0].message.parsed
-    
     # --- LIMPIEZA FORZADA (PYTHON) ---
     # Limpiamos labels y relaciones de las instancias extraídas
     for node in result.nodes:
@@ -196,19 +525,69 @@ def run_extraction_agent(text_content: str, schema: SchemaDefinition, llm_model:
         rel.target_label = remove_accents(rel.target_label)
         rel.relationship = remove_accents(rel.relationship)
 
-    tokens = completion.usage.total_tokens
     print(f"  [EXTRACTOR] 📈 Tokens: {tokens} | Nodos: {len(result.nodes)} | Rels: {len(result.relationships)}")
     return result, tokens
 
-# --- 4. Generador Cypher ---
+# --- 4. Reducción de fragmentos ---
+
+def combinar_esquemas(esquemas: List[SchemaDefinition]) -> SchemaDefinition:
+    return SchemaDefinition(
+        node_labels=sorted({l for e in esquemas for l in e.node_labels}),
+        relationship_types=sorted({r for e in esquemas for r in e.relationship_types}),
+    )
 
-def generate_cypher_fragment(data: ExtractionResult, filename: str) -> str:
+def combinar_extracciones(resultados: List[ExtractionResult]) -> ExtractionResult:
+    """
+    Une las extracciones de los fragmentos de un documento: un nodo por id
+    (label del primer fragmento que lo nombra, la descripción más larga) y
+    una relación por (origen, tipo, destino), con los labels de los nodos.
+    """
+    nodos: Dict[str, GraphNode] = {}
+    for resultado in resultados:
+        for node in resultado.nodes:
+            if not node.id:
+                continue
+            previo = nodos.get(node.id)
+            if previo is None:
+                nodos[node.id] = node
+            elif len(node.properties) > len(previo.properties):
+                previo.properties = node.properties
+
+    relaciones: Dict[Tuple[str, str, str], GraphRelationship] = {}
+    for resultado in resultados:
+        for rel in resultado.relationships:
+            clave = (rel.source_id, rel.relationship, rel.target_id)
+            if clave in relaciones:
+                continue
+            if rel.source_id in nodos:
+                rel.source_label = nodos[rel.source_id].label
+            if rel.target_id in nodos:
+                rel.target_label = nodos[rel.target_id].label
+            relaciones[clave] = rel
+
+    return ExtractionResult(nodes=list(nodos.values()), relationships=list(relaciones.values()))
+
+# --- 5. Generador Cypher ---
+
+def documento_id(filename: str) -> str:
+    return remove_accents(filename.replace(".", "_").replace(" ", "_").replace("-", "_").upper())
+
+def generate_cypher_fragment(data: ExtractionResult, filename: str, duplicados: List[str] = ()) -> str:
+    """
+    Cypher de una extracción. Los `duplicados` (copias de `filename` que no
+    se extrajeron) tienen su propio nodo Documento y MENCIONAN las mismas
+    entidades.
+    """
     cypher_lines = []
     
     # Nodo Documento (Grafo Léxico)
-    doc_id = remove_accents(filename.replace(".", "_").replace(" ", "_").replace("-", "_").upper())
+    documentos = [filename, *duplicados]
+    doc_ids = [documento_id(nombre) for nombre in documentos]
     cypher_lines.append(f"\n// --- ARCHIVO: {filename} ---")
-    cypher_lines.append(f'MERGE (d:Documento {{id: "{doc_id}"}}) ON CREATE SET d.nombre = "{filename}";')
+    if duplicados:
+        cypher_lines.append(f"// --- DUPLICADOS: {', '.join(duplicados)} ---")
+    for doc_id, nombre in zip(doc_ids, documentos):
+        cypher_lines.append(f'MERGE (d:Documento {{id: "{doc_id}"}}) ON CREATE SET d.nombre = "{nombre}";')
 
     generated_ids: Set[str] = set()
     
@@ -218,8 +597,9 @@ def generate_cypher_fragment(data: ExtractionResult, filename: str) -> str:
             safe_prop = node.properties.replace('"', "'")
             # Crear nodo entidad
             cypher_lines.append(f'MERGE (n:{node.label} {{id: "{node.id}"}}) ON CREATE SET n.nombre = "{safe_prop}";')
-            # Conectar con Documento
-            cypher_lines.append(f'MATCH (d:Documento {{id: "{doc_id}"}}), (n:{node.label} {{id: "{node.id}"}}) MERGE (d)-[:MENCIONA]->(n);')
+            # Conectar con Documento (y sus duplicados)
+            for doc_id in doc_ids:
+                cypher_lines.append(f'MATCH (d:Documento {{id: "{doc_id}"}}), (n:{node.label} {{id: "{node.id}"}}) MERGE (d)-[:MENCIONA]->(n);')
             generated_ids.add(node.id)
             
     # Relaciones
@@ -229,15 +609,83 @@ def generate_cypher_fragment(data: ExtractionResult, filename: str) -> str:
 
     return "\n".join(cypher_lines)
 
+# --- 6. Payload parametrizado (JSONL) ---
+
+class PayloadGrafo:
+    """
+    Nodos y aristas de todas las extracciones agrupados por label y por tipo
+    de relación. Cada línea del JSONL es un lote que gen_subir_schma_a_neo.py
+    carga con una única sentencia UNWIND $rows.
+    """
+    def __init__(self):
+        self.documentos: Dict[str, str] = {}
+        self.nodos: Dict[str, Dict[str, str]] = defaultdict(dict)
+        self.menciona: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self.relaciones: Dict[Tuple[str, str, str], Set[Tuple[str, str]]] = defaultdict(set)
+
+    def agregar(self, data: ExtractionResult, filename: str, duplicados: List[str] = ()):
+        # Mismo criterio que generate_cypher_fragment
+        documentos = [filename, *duplicados]
+        doc_ids = [documento_id(nombre) for nombre in documentos]
+        for doc_id, nombre in zip(doc_ids, documentos):
+            self.documentos.setdefault(doc_id, nombre)
+
+        generated_ids: Set[str] = set()
+        for node in data.nodes:
+            if node.id and node.id not in generated_ids:
+                # ON CREATE SET: vale el primer nombre que se vio
+                self.nodos[node.label].setdefault(node.id, node.properties)
+                for doc_id in doc_ids:
+                    self.menciona[node.label].add((doc_id, node.id))
+                generated_ids.add(node.id)
+
+        for rel in data.relationships:
+            if rel.source_id in generated_ids and rel.target_id in generated_ids:
+                clave = (rel.source_label, rel.relationship, rel.target_label)
+                self.relaciones[clave].add((rel.source_id, rel.target_id))
+
+    def lotes(self, labels: List[str], lote: int = LOTE_PAYLOAD):
+        """Registros en orden de carga: constraints, nodos, MENCIONA, relaciones."""
+        def partir(registro, filas):
+            for i in range(0, len(filas), lote):
+                yield {**registro, "filas": filas[i:i + lote]}
+
+        yield {"tipo": "constraints", "labels": sorted({*labels, *self.nodos, "Documento"})}
+        yield from partir({"tipo": "nodos", "label": "Documento"},
+                          [{"id": k, "nombre": v} for k, v in sorted(self.documentos.items())])
+        for label in sorted(self.nodos):
+            yield from partir({"tipo": "nodos", "label": label},
+                              [{"id": k, "nombre": v} for k, v in sorted(self.nodos[label].items())])
+        for label in sorted(self.menciona):
+            yield from partir({"tipo": "menciona", "label": label},
+                              [{"doc": d, "id": i} for d, i in sorted(self.menciona[label])])
+        for desde, relacion, hacia in sorted(self.relaciones):
+            yield from partir({"tipo": "relacion", "desde": desde, "relacion": relacion, "hacia": hacia},
+                              [{"a": a, "b": b} for a, b in sorted(self.relaciones[(desde, relacion, hacia)])])
+
+    def escribir(self, path: str, labels: List[str], lote: int = LOTE_PAYLOAD) -> int:
+        lineas = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for registro in self.lotes(labels, lote):
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                lineas += 1
+        return lineas
+
 # --- MAIN ---
 
 def main():
     txt_files = read_txt_files(FOLDER_PATH)
     if not txt_files: return
 
+    # Copias idénticas o casi idénticas se extraen una sola vez
+    grupos = agrupar_duplicados(txt_files)
+    for original, copias in grupos.items():
+        if copias:
+            print(f"  ♻️ {original}: duplicados {copias} (se extrae una sola vez)")
+    a_extraer = {original: txt_files[original] for original in grupos}
+
     # Inicializar sets limpiando las etiquetas conocidas de entrada
     master_node_labels: Set[str] = set([remove_accents(l) for l in WELL_KNOWN_LABELS])
-    master_relationship_types: Set[str] = set()
     global_schema_triplets: Set[Tuple[str, str, str]] = set()
     
     total_t1 = 0
@@ -246,21 +694,25 @@ def main():
     # FASE 1: DISCOVERY
     print("\n" + "#"*60)
     print("FASE 1: DESCUBRIMIENTO DEL ESQUEMA (Sin Tildes)")
+    tareas = fragmentar(a_extraer)
+    print(f"({len(a_extraer)} archivos en {len(tareas)} fragmentos de hasta {CHUNK_CARACTERES} caracteres, "
+          f"hasta {LLM_CONCURRENCIA} en paralelo, {LLM_TPM} tokens/min)")
     print("#"*60)
 
-    for filename, content in txt_files.items():
-        print(f"\n--- 🔎 Analizando esquema en: {filename} ---")
-        # Pasamos la lista ya limpia de known_labels y el modelo LLM
-        schema, t1 = run_ontology_agent(content, USER_GOAL, list(master_node_labels), LLM_MODEL)
+    # Todos los fragmentos parten de las mismas etiquetas conocidas (ya limpias);
+    # la unión se hace después, en orden de archivo y parte
+    known_labels = sorted(master_node_labels)
+
+    def analizar_esquema(filename, parte, texto):
+        print(f"\n--- 🔎 Analizando esquema en: {filename} [parte {parte + 1}] ---")
+        return run_ontology_agent(texto, USER_GOAL, known_labels, LLM_MODEL)
+
+    esquemas = [SchemaDefinition(node_labels=known_labels, relationship_types=[])]
+    for schema, t1 in procesar_en_paralelo(analizar_esquema, tareas).values():
         total_t1 += t1
-        
-        master_node_labels.update(schema.node_labels)
-        master_relationship_types.update(schema.relationship_types)
-        
-    master_schema = SchemaDefinition(
-        node_labels=sorted(list(master_node_labels)),
-        relationship_types=sorted(list(master_relationship_types))
-    )
+        esquemas.append(schema)
+
+    master_schema = combinar_esquemas(esquemas)
     
     print(f"\n✅ Esquema Maestro Definido (Normalizado):")
     print(f"Labels: {master_schema.node_labels}")
@@ -271,6 +723,7 @@ def main():
     print("#"*60)
     
     full_cypher_script = []
+    payload = PayloadGrafo()
     
     # Constraints (Labels ya limpios)
     full_cypher_script.append("// --- CONSTRAINTS DE UNICIDAD ---")
@@ -278,18 +731,28 @@ def main():
         full_cypher_script.append(f"CREATE CONSTRAINT constraint_{label}_id IF NOT EXISTS FOR (n:{label}) REQUIRE n.id IS UNIQUE;")
     full_cypher_script.append("CREATE CONSTRAINT constraint_Documento_id IF NOT EXISTS FOR (d:Documento) REQUIRE d.id IS UNIQUE;")
 
-    for filename, content in txt_files.items():
-        print(f"\n--- ⛏️ Procesando archivo: {filename} ---")
-        
+    def extraer(filename, parte, texto):
+        print(f"\n--- ⛏️ Procesando archivo: {filename} [parte {parte + 1}] ---")
         # Pasamos el modelo LLM al agente de extracción
-        data, t2 = run_extraction_agent(content, master_schema, LLM_MODEL)
+        return run_extraction_agent(texto, master_schema, LLM_MODEL)
+
+    # Map: una extracción por fragmento; reduce: una por archivo
+    por_archivo: Dict[str, List[ExtractionResult]] = defaultdict(list)
+    for (filename, _), (parcial, t2) in procesar_en_paralelo(extraer, tareas).items():
         total_t2 += t2
-        
+        por_archivo[filename].append(parcial)
+
+    for filename, parciales in por_archivo.items():
+        data = combinar_extracciones(parciales)
+
         for rel in data.relationships:
             global_schema_triplets.add((rel.source_label, rel.relationship, rel.target_label))
 
-        fragment = generate_cypher_fragment(data, filename)
-        full_cypher_script.append(fragment)
+        if FORMATO_SALIDA in ("cypher", "ambos"):
+            fragment = generate_cypher_fragment(data, filename, grupos[filename])
+            full_cypher_script.append(fragment)
+        if FORMATO_SALIDA in ("jsonl", "ambos"):
+            payload.agregar(data, filename, grupos[filename])
 
     # RESULTADOS
     print("\n" + "="*60)
@@ -305,16 +768,22 @@ def main():
     else:
         print("(No se detectaron relaciones)")
 
-    final_script = "\n".join(full_cypher_script)
-    
-    with open("grafo_generado.cypher", "w", encoding="utf-8") as f:
-        f.write(final_script)
-        
-    print("\n" + "="*60)
-    print("💻 SCRIPT CYPHER FINAL (Guardado en 'grafo_generado.cypher')")
-    print("="*60)
-    # Imprime solo las primeras 20 líneas del script para no saturar la consola
-    print("\n".join(final_script.split("\n")[:20]))
+    if FORMATO_SALIDA in ("cypher", "ambos"):
+        final_script = "\n".join(full_cypher_script)
+
+        with open("grafo_generado.cypher", "w", encoding="utf-8") as f:
+            f.write(final_script)
+
+        print("\n" + "="*60)
+        print("💻 SCRIPT CYPHER FINAL (Guardado en 'grafo_generado.cypher')")
+        print("="*60)
+        # Imprime solo las primeras 20 líneas del script para no saturar la consola
+        print("\n".join(final_script.split("\n")[:20]))
+
+    if FORMATO_SALIDA in ("jsonl", "ambos"):
+        lineas = payload.escribir("grafo_generado.jsonl", master_schema.node_labels)
+        print(f"\n📦 Payload guardado en 'grafo_generado.jsonl': {lineas} lotes "
+              f"(cargar con: python gen_subir_schma_a_neo.py grafo_generado.jsonl)")
 
     # --- NUEVO: Grabar esquema conceptual en grafo_concepto.cypher ---
     if schema_conceptual_lines:
@@ -328,6 +797,11 @@ def main():
     # --- FIN NUEVO ---
     
     print(f"\n💰 CONSUMO TOTAL: {total_t1 + total_t2} Tokens")
+    print(f"💾 CACHÉ: {cache.aciertos} respuestas reutilizadas ({cache.tokens_ahorrados} tokens ahorrados), "
+          f"{cache.llamadas} llamadas nuevas a la API")
+    if cache.esquema_anterior:
+        print(f"⚠️ {cache.esquema_anterior} extracciones reutilizadas se hicieron con un esquema anterior "
+              f"(ESQUEMA_VERSION={ESQUEMA_VERSION}); cambiarla o quitarla para re-extraerlas")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
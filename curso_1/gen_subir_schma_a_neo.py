@@ -1,4 +1,7 @@
 import os
+import re
+import sys
+import json
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 
@@ -9,6 +12,18 @@ NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 
+# Plantillas fijas para el payload JSONL de gen_schema_txt.py
+# (FORMATO_SALIDA=jsonl): una sentencia por lote, con los valores como
+# parámetros. Labels y tipos de relación no se pueden parametrizar en Cypher:
+# van en el texto, validados como identificadores.
+PLANTILLAS = {
+    "nodos": "UNWIND $rows AS row MERGE (n:`{label}` {{id: row.id}}) ON CREATE SET n.nombre = row.nombre",
+    "menciona": "UNWIND $rows AS row MATCH (d:Documento {{id: row.doc}}), (n:`{label}` {{id: row.id}}) MERGE (d)-[:MENCIONA]->(n)",
+    "relacion": "UNWIND $rows AS row MATCH (a:`{desde}` {{id: row.a}}), (b:`{hacia}` {{id: row.b}}) MERGE (a)-[:`{relacion}`]->(b)",
+}
+CONSTRAINT = "CREATE CONSTRAINT constraint_{label}_id IF NOT EXISTS FOR (n:`{label}`) REQUIRE n.id IS UNIQUE"
+IDENTIFICADOR = re.compile(r"^\w+$")
+
 # leer archivo cypher
 def load_cypher_from_file(path: str) -> str:
     if not os.path.exists(path):
@@ -39,9 +54,56 @@ def run_script(cypher: str):
     driver.close()
     print("Proceso finalizado.")
 
+# leer payload jsonl (un lote por línea, sin cargar el archivo entero)
+def load_payload(path: str):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe el archivo: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _run_batch(tx, query: str, rows: list):
+    tx.run(query, rows=rows).consume()
+
+# ejecutar payload
+def run_payload(path: str):
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    sentencias = 0
+    filas = 0
+    with driver.session() as session:
+        for idx, lote in enumerate(load_payload(path), start=1):
+            if lote["tipo"] == "constraints":
+                labels = [l for l in lote["labels"] if IDENTIFICADOR.match(l)]
+                for label in labels:
+                    session.run(CONSTRAINT.format(label=label)).consume()
+                sentencias += len(labels)
+                print(f"[{idx}] Constraints: {len(labels)} labels")
+                continue
+
+            nombres = {k: v for k, v in lote.items() if k in ("label", "desde", "relacion", "hacia")}
+            invalidos = [v for v in nombres.values() if not IDENTIFICADOR.match(v)]
+            if invalidos:
+                print(f"[{idx}] Se omite el lote {lote['tipo']} {nombres}: identificador inválido {invalidos}")
+                continue
+
+            query = PLANTILLAS[lote["tipo"]].format(**nombres)
+            session.execute_write(_run_batch, query, lote["filas"])
+            sentencias += 1
+            filas += len(lote["filas"])
+            print(f"[{idx}] {lote['tipo']} {' '.join(nombres.values())}: {len(lote['filas'])} filas")
+
+    driver.close()
+    print(f"Proceso finalizado: {filas} filas en {sentencias} sentencias.")
+
 if __name__ == "__main__":
-    path = "grafo_generado.cypher"
-    cypher_script = load_cypher_from_file(path)
-    print("Ejecutando Cypher...")
-    run_script(cypher_script)
+    # python gen_subir_schma_a_neo.py [grafo_generado.cypher | grafo_generado.jsonl]
+    path = sys.argv[1] if len(sys.argv) > 1 else "grafo_generado.cypher"
+    if path.endswith(".jsonl"):
+        print("Cargando payload por lotes...")
+        run_payload(path)
+    else:
+        cypher_script = load_cypher_from_file(path)
+        print("Ejecutando Cypher...")
+        run_script(cypher_script)
     print("Finalizado.")
@@ -0,0 +1,137 @@
+# exportar_neo4j_admin.py
+# Exporta las entidades detectadas y las relaciones de SEMANTIC_RULES al formato
+# de `neo4j-admin database import full`, para reconstrucciones completas sin Bolt.
+
+import os
+import argparse
+import pandas as pd
+from convertir_bd_kg import (
+    BATCH_SIZE, ContextoCarga, detectar_entidades, detectar_relaciones, clave_primaria,
+)
+from tipos_entidades import tipo_columna
+
+SALIDA = "import_neo4j"
+
+# =======================================================
+# 1. Tipos de columna → tipos de neo4j-admin
+# =======================================================
+# Los tipos salen del esquema (tipos_entidades), no de los dtypes de un
+# chunk: un chunk con nulos en una columna entera la deja en float
+TIPOS_ADMIN = {"int": "long", "date": "date", "datetime": "localdatetime"}
+
+def tipo_admin(entidad, col):
+    tipo = tipo_columna(entidad, col)
+    # Los enums (tuplas) y las columnas fuera del esquema van como string
+    return TIPOS_ADMIN.get(tipo) if isinstance(tipo, str) else None
+
+def encabezado_nodos(entidad, clave, columnas):
+    campos = []
+    for col in columnas:
+        if col == clave:
+            campos.append(f"{col}:ID({entidad})")
+            continue
+        tipo = tipo_admin(entidad, col)
+        campos.append(f"{col}:{tipo}" if tipo else col)
+    return ",".join(campos)
+
+def ajustar_chunk(entidad, chunk):
+    """
+    Castea el chunk a los tipos del encabezado. Los enteros quedan Int64 (un
+    nulo se escribe como campo vacío, no como nan ni 1.0); en las columnas
+    string, un float que solo tiene enteros también se pasa a Int64.
+    """
+    chunk = chunk.copy()
+    for col in chunk.columns:
+        tipo = tipo_admin(entidad, col)
+        serie = chunk[col]
+        if tipo == "long":
+            chunk[col] = pd.to_numeric(serie, errors="coerce").astype("Int64")
+        elif tipo is None and pd.api.types.is_float_dtype(serie) and (serie.dropna() % 1 == 0).all():
+            chunk[col] = serie.astype("Int64")
+    return chunk
+
+def encabezado_relaciones(rel):
+    return f":START_ID({rel['from']}),:END_ID({rel['to']})"
+
+# =======================================================
+# 2. Escritura de archivos (header aparte, datos por chunks)
+# =======================================================
+def _escribir_header(path, header):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(header + "\n")
+
+def exportar_nodos(contexto, entidad, clave, salida, batch_size):
+    datos = os.path.join(salida, f"{entidad}.csv")
+    header = os.path.join(salida, f"{entidad}_header.csv")
+    _escribir_header(header, encabezado_nodos(entidad, clave, contexto.columnas(entidad)))
+    total = 0
+    with open(datos, "w", encoding="utf-8", newline="") as f:
+        for chunk in contexto.leer_en_lotes(entidad, batch_size):
+            chunk = ajustar_chunk(entidad, chunk)
+            chunk.to_csv(f, header=False, index=False, date_format="%Y-%m-%dT%H:%M:%S")
+            total += len(chunk)
+    return header, datos, total
+
+def exportar_relaciones(contexto, rel, salida, batch_size):
+    nombre = f"{rel['type']}_{rel['from']}"
+    datos = os.path.join(salida, f"{nombre}.csv")
+    header = os.path.join(salida, f"{nombre}_header.csv")
+    _escribir_header(header, encabezado_relaciones(rel))
+    total = 0
+    with open(datos, "w", encoding="utf-8", newline="") as f:
+        for chunk in contexto.leer_en_lotes(rel["from"], batch_size):
+            pares = ajustar_chunk(rel["from"], chunk)[[rel["from_key"], rel["from_col"]]].dropna()
+            pares.to_csv(f, header=False, index=False)
+            total += len(pares)
+    return header, datos, total
+
+# =======================================================
+# 3. Exportación completa + comando de import
+# =======================================================
+def exportar(entidades=None, salida=SALIDA, batch_size=BATCH_SIZE):
+    """
+    Escribe los archivos en `salida` y devuelve los argumentos --nodes y
+    --relationships para neo4j-admin.
+    """
+    entidades = entidades or detectar_entidades()
+    contexto = ContextoCarga(entidades)
+    relaciones = detectar_relaciones(entidades, contexto)
+    os.makedirs(salida, exist_ok=True)
+
+    argumentos = []
+    exportadas = set()
+    for entidad in entidades:
+        clave = clave_primaria(entidad, contexto.columnas(entidad))
+        if clave is None:
+            print(f"{entidad}: sin columna id_*, se omite")
+            continue
+        header, datos, total = exportar_nodos(contexto, entidad, clave, salida, batch_size)
+        argumentos.append(f"--nodes={entidad}={header},{datos}")
+        exportadas.add(entidad)
+        print(f"{entidad}: {total} nodos")
+
+    for rel in relaciones:
+        if not {rel["from"], rel["to"]} <= exportadas:
+            continue
+        header, datos, total = exportar_relaciones(contexto, rel, salida, batch_size)
+        argumentos.append(f"--relationships={rel['type']}={header},{datos}")
+        print(f"{rel['type']}: {total} relaciones")
+
+    return argumentos
+
+def comando_import(argumentos, database="neo4j"):
+    # Las claves id_* se exportan como Int64 → --id-type=integer
+    lineas = [f"neo4j-admin database import full {database}", "--id-type=integer",
+              "--skip-bad-relationships", "--overwrite-destination"] + argumentos
+    return " \\\n  ".join(lineas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta los CSV al formato de neo4j-admin import.")
+    parser.add_argument("--salida", default=SALIDA, help="Carpeta de salida")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Filas por chunk de lectura")
+    parser.add_argument("--database", default="neo4j", help="Base de destino del import")
+    args = parser.parse_args()
+
+    argumentos = exportar(salida=args.salida, batch_size=args.batch_size)
+    print("\nEjecutar con la base detenida:\n")
+    print(comando_import(argumentos, args.database))
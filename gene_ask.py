@@ -3,7 +3,8 @@ from google.adk.agents import Agent
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import InMemoryRunner
 from google.genai import types
-from neo4j_for_adk import graphdb
+from neo4j_for_adk import graphdb, asyncgraphdb
+from tipos_entidades import coercionar_filas
 import asyncio
 
 #
@@ -21,6 +22,11 @@ uri = os.getenv("NEO4J_URI", "neo4j+s://b0df6e44.databases.neo4j.io")
 user = os.getenv("NEO4J_USER", "neo4j")
 password = os.getenv("NEO4J_PASSWORD", "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g")
 graphdb.connect(uri, user, password)
+# Consultas del agente por el driver asíncrono: no bloquean el event loop
+asyncgraphdb.connect(uri, user, password)
+
+# Filas por lote al leer los CSV en streaming
+BATCH_SIZE = 5000
 
 # ------------------------------------------------------
 # 1. USER INTENT AGENT
@@ -90,8 +96,24 @@ def approve_construction_plan():
     shared_state["approved_construction_plan"] = plan
     return tool_success("approved_construction_plan", plan)
 
-def construct_domain_graph():
+def read_csv_batches(filepath, batch_size=BATCH_SIZE):
+    """Lee el CSV con DictReader y entrega listas de a lo sumo batch_size filas."""
     import csv
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        batch = []
+        for row in csv.DictReader(f):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def _run_batch(tx, query, rows):
+    tx.run(query, rows=rows).consume()
+
+def construct_domain_graph():
     import os
 
     # Mapeo de entidad a su columna ID principal y archivo CSV
@@ -114,48 +136,53 @@ def construct_domain_graph():
         except Exception as e:
             print(f"Constraint para {entity} ya existe o error: {e}")
 
-    # Cargar nodos desde CSVs
-    for entity, (filename, id_col) in entity_config.items():
-        filepath = os.path.join(os.getcwd(), filename)
-        if not os.path.exists(filepath):
-            print(f"Archivo no encontrado: {filepath}")
-            continue
-
-        with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Crear nodo con todas las propiedades del CSV
-                props = ", ".join([f"{k}: ${k}" for k in row.keys()])
-                query = f"MERGE (n:{entity} {{{props}}})"
-                graphdb.send_query(query, row)
-
-    # Crear relaciones según el plan
-    relationship_mapping = [
-        ("Tramite.csv", "id_tramite", "Tramite", "id_afiliado", "Afiliado", "TRAMITE_DE"),
-        ("Tramite.csv", "id_tramite", "Tramite", "id_prestador", "Prestador", "GESTIONADO_POR"),
-        ("Tramite.csv", "id_tramite", "Tramite", "id_proveedor", "Proveedor", "ASIGNADO_A"),
-        ("Tramite.csv", "id_tramite", "Tramite", "id_protesis", "Protesis", "SOLICITA"),
-        ("Mensaje.csv", "id_mensaje", "Mensaje", "id_tramite", "Tramite", "ASOCIADO_A"),
-        ("Notificacion_Interna.csv", "id_notificacion", "NotificacionInterna", "id_tramite", "Tramite", "RELACIONADA_CON"),
-        ("Incumplimiento.csv", "id_incumplimiento", "Incumplimiento", "id_tramite", "Tramite", "DETECTADO_EN")
-    ]
+    # Una sola sesión para toda la carga; una transacción de escritura por lote
+    with graphdb.driver.session(database=graphdb.database) as session:
+        # Cargar nodos desde CSVs: MERGE solo por la clave (usa el constraint) y
+        # el resto de las propiedades con SET +=
+        for entity, (filename, id_col) in entity_config.items():
+            filepath = os.path.join(os.getcwd(), filename)
+            if not os.path.exists(filepath):
+                print(f"Archivo no encontrado: {filepath}")
+                continue
+
+            query = f"UNWIND $rows AS row MERGE (n:{entity} {{{id_col}: row.{id_col}}}) SET n += row"
+            for batch in read_csv_batches(filepath):
+                # Ids como enteros, fechas como Date: mismos tipos que convertir_bd_kg
+                rows = [row for row in coercionar_filas(entity, batch) if id_col in row]
+                if rows:
+                    session.execute_write(_run_batch, query, rows)
+
+        # Crear relaciones según el plan
+        relationship_mapping = [
+            ("Tramite.csv", "id_tramite", "Tramite", "id_afiliado", "Afiliado", "TRAMITE_DE"),
+            ("Tramite.csv", "id_tramite", "Tramite", "id_prestador", "Prestador", "GESTIONADO_POR"),
+            ("Tramite.csv", "id_tramite", "Tramite", "id_proveedor", "Proveedor", "ASIGNADO_A"),
+            ("Tramite.csv", "id_tramite", "Tramite", "id_protesis", "Protesis", "SOLICITA"),
+            ("Mensaje.csv", "id_mensaje", "Mensaje", "id_tramite", "Tramite", "ASOCIADO_A"),
+            ("Notificacion_Interna.csv", "id_notificacion", "NotificacionInterna", "id_tramite", "Tramite", "RELACIONADA_CON"),
+            ("Incumplimiento.csv", "id_incumplimiento", "Incumplimiento", "id_tramite", "Tramite", "DETECTADO_EN")
+        ]
 
-    for csv_file, from_id_col, from_entity, to_id_col, to_entity, rel_type in relationship_mapping:
-        filepath = os.path.join(os.getcwd(), csv_file)
-        if not os.path.exists(filepath):
-            continue
-
-        with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if from_id_col in row and to_id_col in row:
-                    query = f"""
-                    MATCH (a:{from_entity} {{{from_id_col}: $from_id}})
-                    MATCH (b:{to_entity} {{{to_id_col}: $to_id}})
-                    MERGE (a)-[:{rel_type}]->(b)
-                    """
-                    params = {"from_id": row[from_id_col], "to_id": row[to_id_col]}
-                    graphdb.send_query(query, params)
+        for csv_file, from_id_col, from_entity, to_id_col, to_entity, rel_type in relationship_mapping:
+            filepath = os.path.join(os.getcwd(), csv_file)
+            if not os.path.exists(filepath):
+                continue
+
+            query = f"""
+            UNWIND $rows AS row
+            MATCH (a:{from_entity} {{{from_id_col}: row.from_id}})
+            MATCH (b:{to_entity} {{{to_id_col}: row.to_id}})
+            MERGE (a)-[:{rel_type}]->(b)
+            """
+            for batch in read_csv_batches(filepath):
+                rows = [
+                    {"from_id": row[from_id_col], "to_id": row[to_id_col]}
+                    for row in coercionar_filas(from_entity, batch)
+                    if from_id_col in row and to_id_col in row
+                ]
+                if rows:
+                    session.execute_write(_run_batch, query, rows)
 
     return tool_success("graph_built", "Knowledge graph construido con éxito.")
 
@@ -163,8 +190,8 @@ def construct_domain_graph():
 # 4. QUERY AGENT
 # ------------------------------------------------------
 
-def run_cypher_query(query_text: str):
-    result = graphdb.send_query(query_text)
+async def run_cypher_query(query_text: str):
+    result = await asyncgraphdb.capped_query(query_text)
     shared_state["query_result"] = result
     return tool_success("query_result", result)
 
@@ -217,5 +244,7 @@ async def run_workflow():
         user_id="user_1"
     )
     print(f"Resultado: {result}")
+    await asyncgraphdb.close()
 
-asyncio.run(run_workflow())
+if __name__ == "__main__":
+    asyncio.run(run_workflow())
@@ -123,7 +123,7 @@ def run_cypher_query(query_text: str):
         query_text: La consulta Cypher a ejecutar
     """
     try:
-        result = graphdb.send_query(query_text)
+        result = graphdb.capped_query(query_text)
         shared_state["query_result"] = result
         return tool_success("query_result", result)
     except Exception as e:
@@ -0,0 +1,172 @@
+# generar_datos_pami.py
+# Genera CSV sintéticos con el mismo formato que los de la raíz (Afiliado,
+# Prestador, Proveedor, Protesis, Tramite, Mensaje, Notificacion_Interna,
+# Incumplimiento) y con integridad referencial, para medir los loaders a
+# escala PAMI (10k, 1M o 10M trámites). Se escribe fila por fila: la memoria
+# no depende del volumen.
+
+import os
+import csv
+import random
+import argparse
+from datetime import date, datetime, timedelta
+
+from tipos_entidades import ESTADOS_TRAMITE, TIPOS_NOTIFICACION
+
+ESCALAS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+COLUMNAS = {
+    "Afiliado": ["id_afiliado", "nombre", "dni", "telefono", "email"],
+    "Prestador": ["id_prestador", "nombre", "especialidad", "contacto"],
+    "Proveedor": ["id_proveedor", "nombre", "tipo_insumo", "contacto"],
+    "Protesis": ["id_protesis", "codigo_pami", "descripcion", "tipo"],
+    "Tramite": ["id_tramite", "id_afiliado", "id_prestador", "id_proveedor",
+                "id_protesis", "fecha_solicitud", "fecha_cirugia", "estado"],
+    "Mensaje": ["id_mensaje", "id_tramite", "remitente", "destinatario",
+                "contenido", "fecha_envio"],
+    "Notificacion_Interna": ["id_notificacion", "id_tramite", "tipo",
+                             "descripcion", "fecha_notificacion"],
+    "Incumplimiento": ["id_incumplimiento", "id_tramite", "parte_responsable",
+                       "descripcion", "fecha_detalle", "penalidad_aplicable"],
+}
+
+ESPECIALIDADES = ["Traumatología", "Ortopedia", "Neurocirugía", "Cardiología"]
+INSUMOS = ["Prótesis y fijadores", "Material de osteosíntesis", "Implantes"]
+INICIO = date(2024, 1, 1)
+
+# Tipo de notificación → (parte responsable, descripción)
+INCUMPLIMIENTOS = {
+    "Demora proveedor": ("Proveedor", "Entrega demorada o sin respuesta del proveedor."),
+    "Error prótesis": ("Proveedor", "Envió prótesis incorrecta, requiere reemplazo."),
+    "Demora prestador": ("Prestador", "El prestador no confirma la fecha de cirugía."),
+}
+NOTIFICACIONES = {
+    "Demora proveedor": "Agente informa retraso y solicita intervención de PAMI.",
+    "Error prótesis": "Agente informa envío erróneo y coordina reemplazo.",
+    "Demora prestador": "Agente informa demora del prestador.",
+    "Cierre forzado": "Agente cierra el trámite por falta de respuesta.",
+    "PAMI inactivo": "Agente informa afiliado inactivo en padrón.",
+}
+
+# =======================================================
+# 1. Tamaños derivados (proporciones de los CSV de ejemplo)
+# =======================================================
+def tamanios(tramites):
+    return {
+        "Afiliado": max(50, tramites),
+        "Prestador": max(15, tramites // 1000),
+        "Proveedor": max(10, tramites // 2000),
+        "Protesis": max(30, tramites // 500),
+    }
+
+# =======================================================
+# 2. Escritura en streaming
+# =======================================================
+class Escritores:
+    """Un csv.writer por entidad, con el mismo quoting que los CSV originales."""
+    def __init__(self, salida):
+        os.makedirs(salida, exist_ok=True)
+        self._archivos = {}
+        self._writers = {}
+        self.filas = {}
+        for entidad, columnas in COLUMNAS.items():
+            f = open(os.path.join(salida, f"{entidad}.csv"), "w", encoding="utf-8", newline="")
+            self._archivos[entidad] = f
+            self._writers[entidad] = csv.writer(f, quoting=csv.QUOTE_ALL)
+            self._writers[entidad].writerow(columnas)
+            self.filas[entidad] = 0
+
+    def escribir(self, entidad, fila):
+        self._writers[entidad].writerow(fila)
+        self.filas[entidad] += 1
+
+    def cerrar(self):
+        for f in self._archivos.values():
+            f.close()
+
+def _hora(dia, hora, minuto):
+    return datetime(dia.year, dia.month, dia.day, hora, minuto).strftime("%Y-%m-%d %H:%M")
+
+# =======================================================
+# 3. Generación
+# =======================================================
+def generar_catalogos(esc, n):
+    for i in range(1, n["Afiliado"] + 1):
+        esc.escribir("Afiliado", [i, f"Afiliado {i}", 3000000 + i, 111000000 + i,
+                                  f"afiliado{i}@mail.com"])
+    for i in range(1, n["Prestador"] + 1):
+        esc.escribir("Prestador", [i, f"Prestador {i}", ESPECIALIDADES[i % len(ESPECIALIDADES)],
+                                   f"prestador{i}@clinica.com"])
+    for i in range(1, n["Proveedor"] + 1):
+        esc.escribir("Proveedor", [i, f"Proveedor {i}", INSUMOS[i % len(INSUMOS)],
+                                   f"proveedor{i}@mail.com"])
+    for i in range(1, n["Protesis"] + 1):
+        esc.escribir("Protesis", [i, f"PRT-{i:03d}", f"Descripción de prótesis {i}",
+                                  f"Tipo {i % 10 + 1}"])
+
+def generar_tramites(esc, tramites, n, rnd):
+    id_mensaje = id_notificacion = id_incumplimiento = 0
+    for t in range(1, tramites + 1):
+        proveedor = rnd.randint(1, n["Proveedor"])
+        protesis = rnd.randint(1, n["Protesis"])
+        solicitud = INICIO + timedelta(days=rnd.randint(0, 600))
+        cirugia = solicitud + timedelta(days=rnd.randint(10, 30))
+        estado = rnd.choice(ESTADOS_TRAMITE)
+        esc.escribir("Tramite", [t, rnd.randint(1, n["Afiliado"]), rnd.randint(1, n["Prestador"]),
+                                 proveedor, protesis, solicitud, cirugia, estado])
+
+        mensajes = [
+            ("Prestador", "Agente", f"Solicitud de prótesis {protesis}", _hora(solicitud, 9, 0)),
+            ("Agente", "Proveedor", f"Pedido asignado a proveedor {proveedor}", _hora(solicitud, 9, 5)),
+        ]
+
+        # Los trámites que no terminaron "Finalizado" generan notificación; las
+        # demoras y errores generan además un incumplimiento la mitad de las veces
+        if estado != "Finalizado":
+            tipo = rnd.choice(TIPOS_NOTIFICACION)
+            aviso = solicitud + timedelta(days=rnd.randint(3, 9))
+            mensajes.append(("Agente", rnd.choice(["Proveedor", "Prestador", "PAMI"]),
+                             "Se detecta demora en entrega, informar estado.", _hora(aviso, 10, 0)))
+            id_notificacion += 1
+            esc.escribir("Notificacion_Interna", [id_notificacion, t, tipo, NOTIFICACIONES[tipo],
+                                                  _hora(aviso, 10, 5)])
+            if tipo in INCUMPLIMIENTOS and rnd.random() < 0.5:
+                parte, descripcion = INCUMPLIMIENTOS[tipo]
+                id_incumplimiento += 1
+                esc.escribir("Incumplimiento", [id_incumplimiento, t, parte, descripcion,
+                                                aviso, int(rnd.random() < 0.2)])
+
+        for remitente, destinatario, contenido, fecha in mensajes:
+            id_mensaje += 1
+            esc.escribir("Mensaje", [id_mensaje, t, remitente, destinatario, contenido, fecha])
+
+        if t % 1_000_000 == 0:
+            print(f"  {t} trámites…")
+
+def generar(tramites, salida, semilla=42):
+    """Escribe los ocho CSV en `salida` y devuelve las filas por entidad."""
+    rnd = random.Random(semilla)
+    n = tamanios(tramites)
+    esc = Escritores(salida)
+    try:
+        generar_catalogos(esc, n)
+        generar_tramites(esc, tramites, n, rnd)
+    finally:
+        esc.cerrar()
+    return esc.filas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera CSV sintéticos de trámites de prótesis.")
+    parser.add_argument("--tramites", default="10k",
+                        help="Cantidad de trámites: 10k, 1m, 10m o un número")
+    parser.add_argument("--salida", default=None,
+                        help="Carpeta de salida (por defecto datos_sinteticos/<tramites>)")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    tramites = ESCALAS.get(args.tramites.lower()) or int(args.tramites)
+    salida = args.salida or os.path.join("datos_sinteticos", args.tramites.lower())
+    print(f"Generando {tramites} trámites en {salida}…")
+    filas = generar(tramites, salida, args.semilla)
+    for entidad, total in filas.items():
+        print(f"{entidad}: {total} filas")
@@ -0,0 +1,57 @@
+# buscar_fallos.py
+# Búsqueda full-text (Lucene) sobre el texto de los fallos (Documento.texto).
+#
+#   python buscar_fallos.py "prótesis de cadera demora"
+
+from neo4j import GraphDatabase
+import argparse
+import re
+
+URI = "neo4j+s://b0df6e44.databases.neo4j.io"
+AUTH = ("neo4j", "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g")
+driver = GraphDatabase.driver(URI, auth=AUTH)
+
+INDICE_DOCUMENTOS = "documento_texto"
+
+# Caracteres con significado en la sintaxis de consultas de Lucene
+ESPECIALES_LUCENE = re.compile(r'([+\-!(){}\[\]^"~*?:\\/&|])')
+
+def escapar_lucene(texto):
+    return ESPECIALES_LUCENE.sub(r'\\\1', texto)
+
+def crear_indice_documentos(session):
+    """Índice full-text con analizador en español (stopwords y stemming)."""
+    session.run(f"""
+        CREATE FULLTEXT INDEX {INDICE_DOCUMENTOS} IF NOT EXISTS
+        FOR (d:Documento) ON EACH [d.texto]
+        OPTIONS {{indexConfig: {{`fulltext.analyzer`: 'spanish'}}}}
+    """).consume()
+    session.run("CALL db.awaitIndexes(300)").consume()
+
+def buscar_documentos(consulta, limite=10, largo_fragmento=300, literal=True):
+    """
+    Devuelve los fallos que mejor coinciden con `consulta`, de mayor a menor
+    score: [{"id", "score", "fragmento"}]. Con literal=False la consulta se
+    pasa tal cual a Lucene (admite "frase exacta", AND, término~, etc.).
+    """
+    if literal:
+        consulta = escapar_lucene(consulta)
+    with driver.session() as session:
+        result = session.run("""
+            CALL db.index.fulltext.queryNodes($indice, $consulta)
+            YIELD node, score
+            RETURN node.id AS id, score, left(node.texto, $largo) AS fragmento
+            ORDER BY score DESC
+            LIMIT $limite
+        """, indice=INDICE_DOCUMENTOS, consulta=consulta, limite=limite, largo=largo_fragmento)
+        return [r.data() for r in result]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca fallos por texto.")
+    parser.add_argument("consulta")
+    parser.add_argument("--limite", type=int, default=10)
+    parser.add_argument("--lucene", action="store_true", help="Usa la sintaxis de Lucene sin escapar")
+    args = parser.parse_args()
+
+    for hit in buscar_documentos(args.consulta, args.limite, literal=not args.lucene):
+        print(f"{hit['score']:.3f}  {hit['id']}\n    {hit['fragmento']}\n")
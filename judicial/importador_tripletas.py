@@ -0,0 +1,289 @@
+# importador_tripletas.py
+# Importador único de tripletas sujeto-relación-objeto a nodos Entidad.
+# Formatos: notación (A)-[REL]->(B), CSV con columnas sujeto,relacion,objeto
+# y JSONL con esas mismas claves. subir.py y leva_trip_2.py lo usan.
+#
+#   python importador_tripletas.py triples.csv
+#   python importador_tripletas.py export.jsonl --workers 4 --batch-size 20000
+#   python importador_tripletas.py triples.csv --dry-run
+
+from neo4j import GraphDatabase
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from collections import Counter, defaultdict, deque
+import argparse
+import json
+import time
+import csv
+import os
+import re
+
+# Configuración de Neo4j
+URI = os.getenv("NEO4J_URI", "neo4j+s://b0df6e44.databases.neo4j.io")
+AUTH = (os.getenv("NEO4J_USER", "neo4j"),
+        os.getenv("NEO4J_PASSWORD", "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g"))
+
+driver = GraphDatabase.driver(URI, auth=AUTH)
+
+BATCH_SIZE = 10000
+WORKERS = 1
+
+PATRON = re.compile(r'\(([^)]+)\)-\[(\w+)\]->\(([^)]+)\)')
+# El tipo de relación se escribe en el texto de la consulta: solo \w+
+RELACION_VALIDA = re.compile(r'^\w+$')
+
+# ============================================
+# 1. Parsers: cada uno itera (nro_linea, tripleta o None)
+# ============================================
+
+def parse_flecha(line):
+    """(A)-[REL]->(B) → (A, REL, B) o None."""
+    line = line.replace("\ufeff", "").strip()
+    match = PATRON.match(line)
+    if match:
+        return match.group(1), match.group(2), match.group(3)
+    return None
+
+def _validar(sujeto, relacion, objeto):
+    if sujeto and objeto and relacion and RELACION_VALIDA.match(relacion):
+        return sujeto, relacion, objeto
+    return None
+
+def leer_flecha(f):
+    for nro, line in enumerate(f, 1):
+        if line.strip():
+            yield nro, parse_flecha(line)
+
+def leer_csv(f):
+    reader = csv.DictReader(f)
+    for fila in reader:
+        yield reader.line_num, _validar(fila.get("sujeto", "").strip(),
+                                        fila.get("relacion", "").strip(),
+                                        fila.get("objeto", "").strip())
+
+def leer_jsonl(f):
+    for nro, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            d = json.loads(line)
+        except json.JSONDecodeError:
+            yield nro, None
+            continue
+        yield nro, _validar(str(d.get("sujeto", "")), str(d.get("relacion", "")), str(d.get("objeto", "")))
+
+PARSERS = {
+    "flecha": leer_flecha,
+    "csv": leer_csv,
+    "jsonl": leer_jsonl,
+}
+
+def detectar_formato(ruta):
+    if ruta.endswith(".jsonl"):
+        return "jsonl"
+    with open(ruta, encoding="utf-8-sig") as f:
+        primera = f.readline()
+    # triples.csv y t_2.csv usan la notación de flecha aunque sean .csv
+    if primera.lstrip().startswith("(") or "sujeto" not in primera:
+        return "flecha"
+    return "csv"
+
+# ============================================
+# 2. Lotes (con dedupe dentro de cada lote)
+# ============================================
+
+def lotes_de_tripletas(filas, batch_size, estadisticas):
+    """
+    Agrupa las tripletas válidas en lotes de hasta batch_size tripletas
+    distintas. Entrega (lote, última línea leída); el lote es un dict
+    relación → [{"s", "o"}].
+    """
+    vistas = set()
+    lote = defaultdict(list)
+    ultima = 0
+    for nro, tripleta in filas:
+        ultima = nro
+        if tripleta is None:
+            estadisticas["invalidas"] += 1
+            continue
+        if tripleta in vistas:
+            estadisticas["duplicadas"] += 1
+            continue
+        vistas.add(tripleta)
+        s, r, o = tripleta
+        lote[r].append({"s": s, "o": o})
+        if len(vistas) >= batch_size:
+            yield dict(lote), ultima
+            vistas, lote = set(), defaultdict(list)
+    if vistas:
+        yield dict(lote), ultima
+
+# ============================================
+# 3. Checkpoint
+# ============================================
+
+def ruta_checkpoint(ruta):
+    return f"{ruta}.checkpoint.json"
+
+def leer_checkpoint(ruta):
+    path = ruta_checkpoint(ruta)
+    if not os.path.exists(path):
+        return {"linea": 0, "tripletas": 0}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def guardar_checkpoint(ruta, estado):
+    # Escritura atómica: un corte a mitad de escritura no corrompe el checkpoint
+    path = ruta_checkpoint(ruta)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+    os.replace(f"{path}.tmp", path)
+
+# ============================================
+# 4. Escritura
+# ============================================
+
+def crear_nodos_tx(tx, ids):
+    tx.run("UNWIND $ids AS id MERGE (:Entidad {id: id})", ids=ids)
+
+def crear_relaciones_tx(tx, lote):
+    # Los extremos ya existen (escribir_entidades): solo MATCH, sin crear nodos
+    for relacion, filas in lote.items():
+        tx.run(
+            f"""
+            UNWIND $rows AS row
+            MATCH (s:Entidad {{id: row.s}})
+            MATCH (o:Entidad {{id: row.o}})
+            MERGE (s)-[rel:`{relacion}`]->(o)
+            SET rel.fecha = date()
+            """,
+            rows=filas,
+        )
+
+def escribir_entidades(lote):
+    """
+    MERGE de las entidades distintas del lote, en el hilo principal: las
+    entidades muy citadas (tribunales, leyes) aparecen en casi todos los
+    lotes y crearlas desde varios workers a la vez provoca deadlocks.
+    """
+    ids = sorted({fila[k] for filas in lote.values() for fila in filas for k in ("s", "o")})
+    with driver.session() as session:
+        session.execute_write(crear_nodos_tx, ids)
+    return len(ids)
+
+def particionar(lote, workers):
+    """
+    Reparte las relaciones del lote entre los workers según (s, tipo, o):
+    una misma tripleta cae siempre en el mismo worker, así dos hilos nunca
+    hacen MERGE de la misma relación a la vez.
+    """
+    partes = [defaultdict(list) for _ in range(workers)]
+    for relacion, filas in lote.items():
+        for fila in filas:
+            partes[hash((fila["s"], relacion, fila["o"])) % workers][relacion].append(fila)
+    return [dict(parte) for parte in partes]
+
+def escribir_relaciones(lote):
+    if not lote:
+        return 0
+    with driver.session() as session:
+        session.execute_write(crear_relaciones_tx, lote)
+    return sum(len(f) for f in lote.values())
+
+def crear_constraint():
+    with driver.session() as session:
+        session.run(
+            "CREATE CONSTRAINT entidad_id_unico IF NOT EXISTS FOR (e:Entidad) REQUIRE e.id IS UNIQUE"
+        ).consume()
+
+# ============================================
+# 5. Importación
+# ============================================
+
+def importar(ruta, formato="auto", batch_size=BATCH_SIZE, workers=WORKERS,
+             dry_run=False, reanudar=True):
+    """
+    Importa `ruta` por lotes. Las entidades de cada lote se crean en el hilo
+    principal; las relaciones se reparten entre `workers` hilos de un solo
+    worker cada uno, particionadas por (s, tipo, o). Tras cada lote
+    confirmado se guarda la última línea en <ruta>.checkpoint.json; si el
+    proceso se corta, la próxima ejecución saltea las líneas ya importadas.
+    El checkpoint solo avanza cuando todos los lotes anteriores terminaron
+    (todo es MERGE: repetir un lote ya escrito no duplica nada).
+    dry_run parsea y cuenta sin conectarse a Neo4j.
+    """
+    inicio = time.time()
+    formato = detectar_formato(ruta) if formato == "auto" else formato
+    checkpoint = leer_checkpoint(ruta) if reanudar and not dry_run else {"linea": 0, "tripletas": 0}
+    desde = checkpoint["linea"]
+    if desde:
+        print(f"Reanudando {ruta} desde la línea {desde + 1} ({checkpoint['tripletas']} tripletas ya importadas)")
+
+    estadisticas = Counter()
+    por_relacion = Counter()
+    importadas = checkpoint["tripletas"]
+
+    if not dry_run:
+        crear_constraint()
+
+    with open(ruta, encoding="utf-8-sig", newline="") as f:
+        filas = ((nro, t) for nro, t in PARSERS[formato](f) if nro > desde)
+        lotes = lotes_de_tripletas(filas, batch_size, estadisticas)
+
+        if dry_run:
+            for lote, _ in lotes:
+                for relacion, pares in lote.items():
+                    por_relacion[relacion] += len(pares)
+        else:
+            # Un pool de un hilo por partición: la partición k siempre la
+            # escribe el mismo hilo, en orden. Lotes en vuelo en orden de
+            # envío; a lo sumo 2 en memoria.
+            pendientes = deque()
+
+            def confirmar():
+                nonlocal importadas
+                futuros, linea = pendientes.popleft()
+                wait(futuros)
+                importadas += sum(f.result() for f in futuros)
+                guardar_checkpoint(ruta, {"linea": linea, "tripletas": importadas})
+
+            with ExitStack() as pilas:
+                pools = [pilas.enter_context(ThreadPoolExecutor(max_workers=1)) for _ in range(workers)]
+                for lote, ultima in lotes:
+                    for relacion, pares in lote.items():
+                        por_relacion[relacion] += len(pares)
+                    escribir_entidades(lote)
+                    futuros = [pool.submit(escribir_relaciones, parte)
+                               for pool, parte in zip(pools, particionar(lote, workers))]
+                    pendientes.append((futuros, ultima))
+                    while pendientes and (len(pendientes) >= 2 or all(f.done() for f in pendientes[0][0])):
+                        confirmar()
+                while pendientes:
+                    confirmar()
+
+    total = sum(por_relacion.values())
+    print(f"Formato: {formato}")
+    for relacion, n in por_relacion.most_common():
+        print(f"  {relacion}: {n}")
+    print(f"{total} tripletas {'a importar' if dry_run else 'importadas'}, "
+          f"{estadisticas['duplicadas']} duplicadas en el lote, "
+          f"{estadisticas['invalidas']} líneas no reconocidas ({time.time() - inicio:.1f}s)")
+
+    if not dry_run and os.path.exists(ruta_checkpoint(ruta)):
+        # Importación completa: la próxima corrida empieza de cero
+        os.remove(ruta_checkpoint(ruta))
+
+    return {"tripletas": total, **estadisticas, "por_relacion": dict(por_relacion)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa tripletas a nodos Entidad en Neo4j.")
+    parser.add_argument("archivo")
+    parser.add_argument("--formato", choices=["auto"] + list(PARSERS), default="auto")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="Solo parsea y cuenta")
+    parser.add_argument("--desde-cero", action="store_true", help="Ignora el checkpoint existente")
+    args = parser.parse_args()
+
+    importar(args.archivo, args.formato, args.batch_size, args.workers,
+             dry_run=args.dry_run, reanudar=not args.desde_cero)
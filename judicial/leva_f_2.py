@@ -1,4 +1,7 @@
 from neo4j import GraphDatabase
+from buscar_fallos import crear_indice_documentos
+import argparse
+import re
 
 URI = "neo4j+s://b0df6e44.databases.neo4j.io"
 AUTH = ("neo4j", "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g")
@@ -6,59 +9,78 @@ driver = GraphDatabase.driver(URI, auth=AUTH)
 
 RUTA = "f_2.txt"
 
-def crear_documento(tx, id_fallo, texto):
-    tx.run("""
-        MERGE (d:Documento {id: $id})
-        SET d.texto = $texto
-    """, id=id_fallo, texto=texto)
+# Documentos por transacción (UNWIND)
+BATCH_SIZE = 500
+
+# Encabezado de un fallo: "CSJN_451_2023: texto..." o "CSJN_451_2023,"texto..."
+INICIO_FALLO = re.compile(r'^((?:CSJN|CFed)_\w+)\s*[,:]?(.*)$')
 
-def procesar_archivo():
-    with open(RUTA, encoding="utf-8") as f:
-        lineas = f.readlines()
+def crear_documentos(tx, documentos):
+    tx.run("""
+        UNWIND $docs AS doc
+        MERGE (d:Documento {id: doc.id})
+        SET d.texto = doc.texto
+    """, docs=documentos)
 
-    documentos = []
+def leer_fallos(ruta):
+    """
+    Recorre el archivo línea por línea y entrega (id_fallo, texto) cada vez
+    que un bloque se cierra: en memoria solo queda el fallo en curso.
+    """
     id_actual = None
     buffer_texto = []
-    dentro_de_texto = False
-
-    for linea in lineas:
-        linea = linea.lstrip("\ufeff").rstrip("\n")
 
-        # Detecta inicio de un fallo
-        if linea.startswith("CSJN_") or linea.startswith("CFed_"):
-            # Si ya hay uno en construcción, lo guardo
-            if id_actual and buffer_texto:
-                documentos.append((id_actual, "\n".join(buffer_texto)))
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.lstrip("\ufeff").rstrip("\n")
 
-            # Nueva entrada
-            partes = linea.split(",", 1)
-            id_actual = partes[0].strip()
+            # Detecta inicio de un fallo
+            match = INICIO_FALLO.match(linea)
+            if match:
+                # Si ya hay uno en construcción, se entrega
+                if id_actual and buffer_texto:
+                    yield id_actual, "\n".join(buffer_texto)
 
-            # primer fragmento de texto
-            if len(partes) > 1:
-                texto_inicial = partes[1].lstrip('"').strip()
-                buffer_texto = [texto_inicial]
-            else:
-                buffer_texto = []
+                # Nueva entrada con su primer fragmento de texto
+                id_actual = match.group(1)
+                texto_inicial = match.group(2).strip().lstrip('"').strip()
+                buffer_texto = [texto_inicial] if texto_inicial else []
+                continue
 
-            dentro_de_texto = True
-            continue
+            # Acumular líneas del bloque
+            if id_actual:
+                # Eliminar comillas finales si es la última línea del bloque
+                buffer_texto.append(linea.strip().rstrip('"'))
 
-        # Acumular líneas del bloque
-        if dentro_de_texto:
-            # Eliminar comillas finales si es la última línea del bloque
-            linea_sin = linea.strip().rstrip('"')
-            buffer_texto.append(linea_sin)
-
-    # Guardar el último documento
+    # El último documento
     if id_actual and buffer_texto:
-        documentos.append((id_actual, "\n".join(buffer_texto)))
+        yield id_actual, "\n".join(buffer_texto)
 
-    # Crear nodos
+def procesar_archivo(ruta=RUTA, batch_size=BATCH_SIZE):
+    total = 0
+    lote = []
     with driver.session() as session:
-        for id_fallo, texto in documentos:
-            session.execute_write(crear_documento, id_fallo, texto)
-            print("Documento creado:", id_fallo)
+        for id_fallo, texto in leer_fallos(ruta):
+            lote.append({"id": id_fallo, "texto": texto.strip()})
+            if len(lote) >= batch_size:
+                session.execute_write(crear_documentos, lote)
+                total += len(lote)
+                print(f"Documentos creados: {total}")
+                lote = []
+        if lote:
+            session.execute_write(crear_documentos, lote)
+            total += len(lote)
+        print(f"Documentos creados: {total}")
+
+        # Búsqueda por texto sin escanear todos los Documento (ver buscar_fallos.py)
+        crear_indice_documentos(session)
+        print("Índice full-text de Documento.texto en línea.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga los fallos de un archivo de texto como nodos Documento.")
+    parser.add_argument("archivo", nargs="?", default=RUTA)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
 
-procesar_archivo()
-print("Finalizado.")
+    procesar_archivo(args.archivo, args.batch_size)
+    print("Finalizado.")
@@ -1,52 +1,25 @@
-from neo4j import GraphDatabase
-import re
+# subir.py
+# Envoltorio de importador_tripletas.py para triples.csv (notación (A)-[REL]->(B)).
+#
+#   python subir.py [archivo] [--workers N] [--batch-size N] [--dry-run]
 
-# Configuración de Neo4j
-URI = "neo4j+s://b0df6e44.databases.neo4j.io"
-AUTH = ("neo4j", "NQkXw6G9S7jO8wQXQIRpd5BX-g2t_bEvXweJVPSWO1g")
+import argparse
+from importador_tripletas import BATCH_SIZE, importar, parse_flecha
 
-driver = GraphDatabase.driver(URI, auth=AUTH)
+# Se mantiene por compatibilidad con quien lo importaba de este módulo
+parse_triple = parse_flecha
 
-def parse_triple(line):
-    # Eliminar BOM si existe
-    line = line.replace("\ufeff", "").strip()
+WORKERS = 4
 
-    # Formato correcto: (A)-[REL]->(B)
-    match = re.match(r'\(([^)]+)\)-\[(\w+)\]->\(([^)]+)\)', line)
-    if match:
-        return match.group(1), match.group(2), match.group(3)
-    return None
-
-def import_triple(tx, sujeto, relacion, objeto):
-    query = """
-    MERGE (s:Entidad {id: $s})
-    MERGE (o:Entidad {id: $o})
-    CALL apoc.merge.relationship(s, $r, {}, {}, o) YIELD rel
-    SET rel.fecha = date()
-    RETURN rel
-    """
-    tx.run(query, s=sujeto, r=relacion, o=objeto)
-
-def main():
-    with driver.session() as session:
-        count = 0
-        with open('triples.csv', 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f, 1):
-
-                if not line.strip():
-                    continue
-
-                triple = parse_triple(line)
-
-                if triple:
-                    s, r, o = triple
-                    session.execute_write(import_triple, s, r, o)
-                    print(f"OK {count+1}: {s} -[{r}]-> {o}")
-                    count += 1
-                else:
-                    print(f"Línea no reconocida {i}: {line.strip()}")
-
-        print(f"\nImportación completada: {count} tripletas.")
+def main(ruta='triples.csv', batch_size=BATCH_SIZE, workers=WORKERS, dry_run=False):
+    return importar(ruta, "flecha", batch_size, workers, dry_run=dry_run)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Importa tripletas (A)-[REL]->(B) a Neo4j.")
+    parser.add_argument("archivo", nargs="?", default="triples.csv")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="Solo parsea y cuenta")
+    args = parser.parse_args()
+
+    main(args.archivo, args.batch_size, args.workers, args.dry_run)
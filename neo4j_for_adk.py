@@ -1,20 +1,244 @@
 # neo4j_for_adk.py
-from neo4j import GraphDatabase
+import os
+import json
+from contextlib import contextmanager, asynccontextmanager
+from neo4j import AsyncGraphDatabase, GraphDatabase, RoutingControl, READ_ACCESS, WRITE_ACCESS
+
+# Pool de conexiones compartido por todas las herramientas (configurable por entorno)
+POOL_CONFIG = {
+    "max_connection_pool_size": int(os.getenv("NEO4J_POOL_SIZE", "50")),
+    "connection_acquisition_timeout": float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60")),
+    "keep_alive": True,
+}
+
+# Filas por transacción en send_many
+BATCH_SIZE = 5000
+
+# Límites de capped_query: lo que vuelve al LLM queda acotado sin importar la consulta
+FETCH_SIZE = 1000
+MAX_ROWS = int(os.getenv("NEO4J_MAX_ROWS", "200"))
+MAX_BYTES = int(os.getenv("NEO4J_MAX_BYTES", "64000"))
+
+class ResultadoAcotado:
+    """Acumula filas hasta max_rows o max_bytes (JSON) y arma la metadata de truncado."""
+    def __init__(self, max_rows=MAX_ROWS, max_bytes=MAX_BYTES):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = []
+        self.bytes = 0
+        self.motivo = None
+
+    def agregar(self, row):
+        """Devuelve False cuando ya no entran más filas."""
+        if len(self.rows) >= self.max_rows:
+            self.motivo = "max_rows"
+            return False
+        tamanio = len(json.dumps(row, default=str, ensure_ascii=False).encode("utf-8"))
+        if self.bytes + tamanio > self.max_bytes:
+            self.motivo = "max_bytes"
+            return False
+        self.rows.append(row)
+        self.bytes += tamanio
+        return True
+
+    def resultado(self):
+        return {
+            "rows": self.rows,
+            "row_count": len(self.rows),
+            "bytes": self.bytes,
+            "truncated": self.motivo is not None,
+            "truncated_by": self.motivo,
+        }
 
 class GraphDB:
     def __init__(self):
         self.driver = None
+        self.database = None
+
+    def connect(self, uri, username, password, database=None, **pool_config):
+        """pool_config sobrescribe POOL_CONFIG (p. ej. max_connection_pool_size=10)."""
+        config = {**POOL_CONFIG, **pool_config}
+        self.driver = GraphDatabase.driver(uri, auth=(username, password), **config)
+        self.database = database
+
+    def close(self):
+        if self.driver is not None:
+            self.driver.close()
+            self.driver = None
+
+    def send_query(self, query, params=None, read=False):
+        """
+        Ejecuta la consulta en una transacción administrada del pool
+        (driver.execute_query): sin sesión nueva por llamada y con reintentos
+        ante errores transitorios. read=True la enruta a los lectores.
+        """
+        records, _, _ = self.driver.execute_query(
+            query, params or {},
+            database_=self.database,
+            routing_=RoutingControl.READ if read else RoutingControl.WRITE,
+        )
+        return [record.data() for record in records]
 
-    def connect(self, uri, username, password):
-        self.driver = GraphDatabase.driver(uri, auth=(username, password))
+    def read_query(self, query, params=None):
+        return self.send_query(query, params, read=True)
 
-    def send_query(self, query, params=None):
-        with self.driver.session() as session:
-            result = session.run(query, params or {})
-            return [record.data() for record in result]
+    def stream_query(self, query, params=None, read=True, fetch_size=FETCH_SIZE):
+        """
+        Generador de filas: el servidor las envía de a fetch_size y solo se
+        guarda en memoria el lote en curso. Si se corta la iteración, el resto
+        del resultado se descarta al cerrar la sesión.
+        """
+        modo = READ_ACCESS if read else WRITE_ACCESS
+        with self.driver.session(database=self.database, default_access_mode=modo,
+                                 fetch_size=fetch_size) as session:
+            for record in session.run(query, params or {}):
+                yield record.data()
+
+    def capped_query(self, query, params=None, max_rows=MAX_ROWS, max_bytes=MAX_BYTES, read=True):
+        """
+        Como read_query pero con tope de filas y de bytes. Devuelve
+        {"rows", "row_count", "bytes", "truncated", "truncated_by"}.
+        """
+        acotado = ResultadoAcotado(max_rows, max_bytes)
+        filas = self.stream_query(query, params, read, fetch_size=min(max_rows + 1, FETCH_SIZE))
+        try:
+            for row in filas:
+                if not acotado.agregar(row):
+                    break
+        finally:
+            filas.close()
+        return acotado.resultado()
+
+    def send_many(self, query, rows, batch_size=BATCH_SIZE, param="rows"):
+        """
+        Envía `rows` en lotes de batch_size como $rows (la consulta debe hacer
+        UNWIND $rows AS row ...). Una sola sesión; una transacción por lote.
+        Devuelve la cantidad de filas enviadas.
+        """
+        def _tx(tx, lote):
+            tx.run(query, {param: lote}).consume()
+
+        total = 0
+        lote = []
+        with self.driver.session(database=self.database) as session:
+            for row in rows:
+                lote.append(row)
+                if len(lote) >= batch_size:
+                    session.execute_write(_tx, lote)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                session.execute_write(_tx, lote)
+                total += len(lote)
+        return total
+
+    @contextmanager
+    def transaction(self, read=False):
+        """
+        Transacción explícita: commit al salir sin error, rollback si hay
+        excepción. Para agrupar varias consultas en un único viaje al pool.
+
+            with graphdb.transaction() as tx:
+                tx.run(...)
+        """
+        modo = READ_ACCESS if read else WRITE_ACCESS
+        with self.driver.session(database=self.database, default_access_mode=modo) as session:
+            with session.begin_transaction() as tx:
+                yield tx
+
+    def read_transaction(self):
+        return self.transaction(read=True)
+
+    def write_transaction(self):
+        return self.transaction(read=False)
 
 graphdb = GraphDB()
 
+class AsyncGraphDB:
+    """
+    Versión asíncrona de GraphDB sobre AsyncGraphDatabase, para las
+    herramientas de los runners ADK: una consulta a Aura no bloquea el event
+    loop y varias sesiones de agente pueden consultar en paralelo.
+    El driver queda atado al event loop donde se usa por primera vez.
+    """
+    def __init__(self):
+        self.driver = None
+        self.database = None
+
+    def connect(self, uri, username, password, database=None, **pool_config):
+        config = {**POOL_CONFIG, **pool_config}
+        self.driver = AsyncGraphDatabase.driver(uri, auth=(username, password), **config)
+        self.database = database
+
+    async def close(self):
+        if self.driver is not None:
+            await self.driver.close()
+            self.driver = None
+
+    async def send_query(self, query, params=None, read=False):
+        records, _, _ = await self.driver.execute_query(
+            query, params or {},
+            database_=self.database,
+            routing_=RoutingControl.READ if read else RoutingControl.WRITE,
+        )
+        return [record.data() for record in records]
+
+    async def read_query(self, query, params=None):
+        return await self.send_query(query, params, read=True)
+
+    async def stream_query(self, query, params=None, read=True, fetch_size=FETCH_SIZE):
+        modo = READ_ACCESS if read else WRITE_ACCESS
+        async with self.driver.session(database=self.database, default_access_mode=modo,
+                                       fetch_size=fetch_size) as session:
+            result = await session.run(query, params or {})
+            async for record in result:
+                yield record.data()
+
+    async def capped_query(self, query, params=None, max_rows=MAX_ROWS, max_bytes=MAX_BYTES, read=True):
+        acotado = ResultadoAcotado(max_rows, max_bytes)
+        filas = self.stream_query(query, params, read, fetch_size=min(max_rows + 1, FETCH_SIZE))
+        try:
+            async for row in filas:
+                if not acotado.agregar(row):
+                    break
+        finally:
+            await filas.aclose()
+        return acotado.resultado()
+
+    async def send_many(self, query, rows, batch_size=BATCH_SIZE, param="rows"):
+        async def _tx(tx, lote):
+            result = await tx.run(query, {param: lote})
+            await result.consume()
+
+        total = 0
+        lote = []
+        async with self.driver.session(database=self.database) as session:
+            for row in rows:
+                lote.append(row)
+                if len(lote) >= batch_size:
+                    await session.execute_write(_tx, lote)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                await session.execute_write(_tx, lote)
+                total += len(lote)
+        return total
+
+    @asynccontextmanager
+    async def transaction(self, read=False):
+        modo = READ_ACCESS if read else WRITE_ACCESS
+        async with self.driver.session(database=self.database, default_access_mode=modo) as session:
+            async with await session.begin_transaction() as tx:
+                yield tx
+
+    def read_transaction(self):
+        return self.transaction(read=True)
+
+    def write_transaction(self):
+        return self.transaction(read=False)
+
+asyncgraphdb = AsyncGraphDB()
+
 # Funciones de utilidad para herramientas
 def tool_success(key: str, value):
     """Retorna un diccionario indicando éxito de la herramienta."""
@@ -29,3 +253,18 @@ def tool_error(message: str):
         "status": "error",
         "error_message": message
     }
+
+# Herramientas asíncronas para los agentes ADK (usan asyncgraphdb)
+async def run_read_query(query_text: str):
+    """Ejecuta una consulta Cypher de solo lectura en Neo4j y devuelve las filas (acotadas)."""
+    try:
+        return tool_success("query_result", await asyncgraphdb.capped_query(query_text))
+    except Exception as e:
+        return tool_error(f"Error ejecutando consulta: {e}")
+
+async def run_write_query(query_text: str):
+    """Ejecuta una consulta Cypher de escritura en Neo4j."""
+    try:
+        return tool_success("query_result", await asyncgraphdb.send_query(query_text))
+    except Exception as e:
+        return tool_error(f"Error ejecutando consulta: {e}")
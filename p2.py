@@ -18,7 +18,7 @@ def run_cypher_query(query_text: str):
     # Limpieza básica del texto generado por el modelo
     query_text = query_text.replace("\\", "").strip().strip("```cypher").strip("```")
     print(f"\n[DEBUG] Ejecutando Cypher:\n{query_text}\n")
-    result = graphdb.send_query(query_text)
+    result = graphdb.capped_query(query_text)
     return {"status": "success", "result": result}
 
 
@@ -5,7 +5,7 @@ from google.adk.agents import Agent
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import InMemoryRunner
 from google.adk.tools import ToolContext
-from neo4j_for_adk import graphdb, tool_success, tool_error
+from neo4j_for_adk import asyncgraphdb, tool_success, tool_error
 import asyncio, os, warnings, logging
 
 # === CONFIGURACIÓN GENERAL ===
@@ -25,7 +25,7 @@ user = os.getenv("NEO4J_USER", "neo4j")
 password = os.getenv("NEO4J_PASSWORD")
 if not password:
     raise ValueError("NEO4J_PASSWORD no está configurada en las variables de entorno")
-graphdb.connect(uri, user, password)
+asyncgraphdb.connect(uri, user, password)
 print("✅ Conectado a Neo4j")
 
 # === AGENTE 1: User Intent (define objetivo del grafo) ===
@@ -94,7 +94,7 @@ schema_agent = Agent(
 )
 
 # === AGENTE 4: Graph Construction ===
-def construct_domain_graph(tool_context: ToolContext):
+async def construct_domain_graph(tool_context: ToolContext):
     plan = {
         "Tramite": {"construction_type": "node", "source_file": "tramites.csv",
                     "label": "Tramite", "unique_column_name": "tramite_id",
@@ -134,7 +134,7 @@ def construct_domain_graph(tool_context: ToolContext):
     # Crear constraints en Neo4j
     for rule in plan.values():
         if rule["construction_type"] == "node":
-            graphdb.send_query(
+            await asyncgraphdb.send_query(
                 f"CREATE CONSTRAINT IF NOT EXISTS FOR (n:{rule['label']}) REQUIRE n.{rule['unique_column_name']} IS UNIQUE"
             )
 
@@ -165,5 +165,6 @@ async def main():
     print(result)
     print("\n=== ESTADO FINAL DEL CONTEXTO ===")
     print(runner.context.state)
+    await asyncgraphdb.close()
 
 asyncio.run(main())
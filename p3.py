@@ -2,7 +2,7 @@
 from google.adk.agents import Agent
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import InMemoryRunner
-from neo4j_for_adk import graphdb
+from neo4j_for_adk import asyncgraphdb
 import asyncio, os
 
 # === CONFIGURACIÓN GENERAL ===
@@ -16,13 +16,14 @@ user = os.getenv("NEO4J_USER", "neo4j")
 password = os.getenv("NEO4J_PASSWORD")
 if not password:
     raise ValueError("NEO4J_PASSWORD no está configurada en las variables de entorno")
-graphdb.connect(uri, user, password)
+asyncgraphdb.connect(uri, user, password)
 
 # === TOOL ===
-def run_cypher_query(query_text: str):
+# Asíncrona: mientras Neo4j responde, el event loop atiende otras sesiones
+async def run_cypher_query(query_text: str):
     query_text = query_text.replace("\\", "").replace("```", "").strip()
     print(f"\n[DEBUG] Ejecutando en Neo4j:\n{query_text}\n")
-    result = graphdb.send_query(query_text)
+    result = await asyncgraphdb.capped_query(query_text)
     return {"status": "success", "result": result}
 
 # === MODELOS ===
@@ -98,11 +99,14 @@ async def run_queries():
     runner = InMemoryRunner(agent=orchestrator_agent, app_name="multiagent_protesis")
     print("🤖 Multiagente de consultas sobre grafo de prótesis iniciado.")
 
-    while True:
-        pregunta = input("\n🟢 Ingresá tu pregunta (o 'salir'): ")
-        if pregunta.lower() in ["salir", "exit", "q"]:
-            break
-        result = await runner.run_debug(pregunta, user_id="user_1")
-        print(f"\n✅ Respuesta Final:\n{result}\n")
+    try:
+        while True:
+            pregunta = input("\n🟢 Ingresá tu pregunta (o 'salir'): ")
+            if pregunta.lower() in ["salir", "exit", "q"]:
+                break
+            result = await runner.run_debug(pregunta, user_id="user_1")
+            print(f"\n✅ Respuesta Final:\n{result}\n")
+    finally:
+        await asyncgraphdb.close()
 
 asyncio.run(run_queries())
@@ -16,7 +16,7 @@ graphdb.connect(uri, user, password)
 # === TOOL: EJECUCIÓN DE CONSULTAS CYTHER ===
 def run_cypher_query(query_text: str):
     print(f"\n🔍 Consulta generada por el modelo:\n{query_text}\n")
-    result = graphdb.send_query(query_text)
+    result = graphdb.capped_query(query_text)
     return {"status": "success", "result": result}
 
 # === DEFINICIÓN DEL AGENTE ===
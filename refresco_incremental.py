@@ -0,0 +1,137 @@
+# refresco_incremental.py
+# Refresco incremental del grafo a partir de un manifiesto de hashes por fila.
+# Usado por convertir_bd_kg.py y conver_0.py en lugar de DETACH DELETE + recarga.
+# Cada loader tiene su propio manifiesto (arman grafos distintos).
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import pandas as pd
+
+# ============================================
+# 1. Manifiesto
+# ============================================
+
+def hash_fila(fila):
+    datos = {k: v for k, v in fila.items() if pd.notna(v)}
+    texto = json.dumps(datos, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+class Manifiesto:
+    """
+    Hashes por fila en SQLite (tabla filas: entidad, clave, hash), escritos
+    chunk por chunk: la memoria depende del tamaño del lote, no de los CSV.
+    Las claves se guardan serializadas en JSON para recuperar su tipo
+    original (int o str) al borrar nodos.
+
+    Se escribe en `<path>.tmp` y se publica con `confirmar()`; un proceso
+    interrumpido deja el manifiesto anterior intacto. Con `comparar=True` el
+    manifiesto anterior se adjunta como `previo` para calcular el delta.
+    """
+    def __init__(self, path, comparar=False):
+        self.path = path
+        self.tmp = f"{path}.tmp"
+        self.lock = threading.Lock()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        self.conn = sqlite3.connect(self.tmp, check_same_thread=False)
+        self.conn.execute("CREATE TABLE filas (entidad TEXT, clave TEXT, hash TEXT, PRIMARY KEY (entidad, clave))")
+        self.conn.execute("CREATE TEMP TABLE lote (clave TEXT PRIMARY KEY, hash TEXT)")
+        self.comparar = comparar and os.path.exists(path)
+        if self.comparar:
+            self.conn.execute("ATTACH DATABASE ? AS previo", (path,))
+
+    def _cargar_lote(self, entidad, df, clave):
+        df = df[df[clave].notna()]
+        filas = [(json.dumps(fila[clave]), hash_fila(fila)) for fila in df.to_dict("records")]
+        self.conn.execute("DELETE FROM lote")
+        self.conn.executemany("INSERT OR REPLACE INTO lote VALUES (?, ?)", filas)
+        self.conn.execute("INSERT OR REPLACE INTO filas SELECT ?, clave, hash FROM lote", (entidad,))
+        return df
+
+    def registrar(self, entidad, clave, df):
+        """Guarda los hashes de un DataFrame o chunk (carga completa)."""
+        with self.lock:
+            self._cargar_lote(entidad, df, clave)
+
+    def comparar_lote(self, entidad, clave, df):
+        """
+        Registra los hashes del chunk y devuelve (filas nuevas o modificadas
+        respecto del manifiesto anterior, claves que no existían en él).
+        """
+        with self.lock:
+            df = self._cargar_lote(entidad, df, clave)
+            if not self.comparar:
+                return df, df[clave].tolist()
+            distintas = self.conn.execute("""
+                SELECT l.clave, p.clave IS NULL FROM lote l
+                LEFT JOIN previo.filas p ON p.entidad = ? AND p.clave = l.clave
+                WHERE p.hash IS NULL OR p.hash != l.hash
+            """, (entidad,)).fetchall()
+        cambiadas = {json.loads(k) for k, _ in distintas}
+        nuevas = [json.loads(k) for k, es_nueva in distintas if es_nueva]
+        return df[df[clave].isin(cambiadas)], nuevas
+
+    def eliminadas(self, entidad, tamanio):
+        """
+        Claves del manifiesto anterior que ya no están, en lotes de
+        `tamanio`. Llamar después de comparar todos los chunks de la entidad.
+        """
+        if not self.comparar:
+            return
+        cursor = self.conn.execute("""
+            SELECT p.clave FROM previo.filas p
+            WHERE p.entidad = ? AND NOT EXISTS (
+                SELECT 1 FROM filas f WHERE f.entidad = p.entidad AND f.clave = p.clave
+            )
+        """, (entidad,))
+        while True:
+            lote = cursor.fetchmany(tamanio)
+            if not lote:
+                break
+            yield [json.loads(k) for (k,) in lote]
+
+    def confirmar(self):
+        self.conn.commit()
+        if self.comparar:
+            self.conn.execute("DETACH DATABASE previo")
+        self.conn.close()
+        os.replace(self.tmp, self.path)
+
+def descartar_manifiesto(path):
+    # Tras una reconstrucción sin manifiesto el anterior ya no describe el grafo
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"Manifiesto {path} descartado (el grafo se reconstruyó sin él)")
+
+# ============================================
+# 2. Transacciones
+# ============================================
+
+def upsert_nodos_tx(tx, etiqueta, clave, filas):
+    tx.run(
+        f"UNWIND $rows AS row MERGE (n:{etiqueta} {{{clave}: row.{clave}}}) SET n = row",
+        rows=filas,
+    )
+
+def borrar_nodos_tx(tx, etiqueta, clave, ids):
+    tx.run(
+        f"UNWIND $ids AS id MATCH (n:{etiqueta} {{{clave}: id}}) DETACH DELETE n",
+        ids=ids,
+    )
+
+def borrar_relaciones_tx(tx, etiqueta, clave, tipo, ids):
+    tx.run(
+        f"""
+        UNWIND $ids AS id
+        MATCH (n:{etiqueta} {{{clave}: id}})-[r:{tipo}]->()
+        DELETE r
+        """,
+        ids=ids,
+    )
+
+def lotes_de(lista, tamanio):
+    for i in range(0, len(lista), tamanio):
+        yield lista[i:i + tamanio]
@@ -0,0 +1,127 @@
+# tipos_entidades.py
+# Esquema de tipos por entidad para las cargas desde CSV.
+# Usado por convertir_bd_kg.py, conver_0.py y gene_ask.py para que una misma
+# propiedad tenga el mismo tipo en Neo4j sin importar qué loader la escribió.
+
+import pandas as pd
+
+# ============================================
+# 1. Esquema
+# ============================================
+# Tipos: "int", "date" (Date de Neo4j), "datetime" (LocalDateTime) o una
+# tupla con los valores conocidos de un enum (sacados de los CSV de ejemplo:
+# un valor fuera de la lista se carga igual y se avisa). Toda columna id_*
+# que no figure en el esquema se trata como "int".
+
+ESTADOS_TRAMITE = ("Finalizado", "Finalizado con demora", "Finalizado forzado",
+                   "Cancelado", "Cancelado por paciente")
+PARTES_MENSAJE = ("Agente", "PAMI", "Prestador", "Proveedor")
+PARTES_RESPONSABLES = ("Prestador", "Proveedor")
+TIPOS_NOTIFICACION = ("Cierre forzado", "Demora prestador", "Demora proveedor",
+                      "Error prótesis", "PAMI inactivo")
+
+ESQUEMA = {
+    "afiliado": {"dni": "int"},
+    "prestador": {},
+    "proveedor": {},
+    "protesis": {},
+    "tramite": {
+        "fecha_solicitud": "date",
+        "fecha_cirugia": "date",
+        "estado": ESTADOS_TRAMITE,
+    },
+    "mensaje": {
+        "remitente": PARTES_MENSAJE,
+        "destinatario": PARTES_MENSAJE,
+        "fecha_envio": "datetime",
+    },
+    "notificacioninterna": {
+        "tipo": TIPOS_NOTIFICACION,
+        "fecha_notificacion": "datetime",
+    },
+    "incumplimiento": {
+        "parte_responsable": PARTES_RESPONSABLES,
+        "fecha_detalle": "date",
+        "penalidad_aplicable": "int",
+    },
+}
+
+def _clave_esquema(entidad):
+    # Notificacion_interna (convertir_bd_kg) y NotificacionInterna (gene_ask)
+    return entidad.replace("_", "").lower()
+
+def tipo_columna(entidad, columna):
+    tipo = ESQUEMA.get(_clave_esquema(entidad), {}).get(columna)
+    if tipo is None and columna.startswith("id_"):
+        return "int"
+    return tipo
+
+# ============================================
+# 2. Coerción vectorizada
+# ============================================
+
+def _a_entero(serie):
+    return pd.to_numeric(serie, errors="coerce").astype("Int64")
+
+def _a_fecha(serie):
+    return pd.to_datetime(serie, errors="coerce").dt.date
+
+def _a_fecha_hora(serie):
+    # Los CSV de ejemplo traen "2025-10-13 00:00:00 09:00": fecha con hora
+    # nula seguida de la hora real
+    texto = serie.astype("string").str.replace(
+        r"^(\d{4}-\d{2}-\d{2}) 00:00:00 (\d{2}:\d{2})$", r"\1 \2", regex=True
+    )
+    return pd.to_datetime(texto, errors="coerce", format="mixed")
+
+def _a_enum(serie):
+    texto = serie.astype("string").str.strip()
+    return texto.where(texto != "")
+
+def _fuera_de_enum(serie, valores):
+    presentes = serie.dropna()
+    return sorted(presentes[~presentes.isin(valores)].unique())
+
+def _convertir(serie, tipo):
+    if tipo == "int":
+        return _a_entero(serie)
+    if tipo == "date":
+        return _a_fecha(serie)
+    if tipo == "datetime":
+        return _a_fecha_hora(serie)
+    return _a_enum(serie)
+
+def coercionar(entidad, df):
+    """
+    Devuelve una copia de `df` con las columnas del esquema convertidas.
+    Los valores que no se pueden convertir quedan nulos (y no se escriben
+    como propiedad); se informa cuántos hubo por columna. Los enums solo se
+    normalizan (strip): los valores desconocidos se conservan y se informan.
+    """
+    df = df.copy()
+    for col in df.columns:
+        tipo = tipo_columna(entidad, col)
+        if tipo is None:
+            continue
+        original = df[col]
+        df[col] = _convertir(original, tipo)
+        perdidos = int((df[col].isna() & original.notna() & (original.astype("string") != "")).sum())
+        if perdidos:
+            print(f"Aviso: {entidad}.{col}: {perdidos} valores no convertibles a {tipo}")
+        if isinstance(tipo, tuple):
+            desconocidos = _fuera_de_enum(df[col], tipo)
+            if desconocidos:
+                print(f"Aviso: {entidad}.{col}: {len(desconocidos)} valores fuera de la lista conocida, "
+                      f"se cargan igual: {desconocidos[:5]}")
+    return df
+
+def coercionar_filas(entidad, filas):
+    """
+    Igual que `coercionar` pero para lotes de dicts (csv.DictReader).
+    Devuelve los dicts sin las propiedades nulas.
+    """
+    df = coercionar(entidad, pd.DataFrame(filas))
+    return [
+        {k: v for k, v in fila.items() if pd.notna(v)}
+        for fila in df.to_dict("records")
+    ]